@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 from modules.result_display.routes import result_display as result_display
 from modules.payment_processing.routes import payment as payment_processing
 from modules.game_management.routes import game_management as game_management_bp
+from modules.prediction.registry import model_registry
+from modules.prediction.lineup_watcher import lineup_watcher
 from flask import Flask, render_template
 
 # Load environment variables from .env file
@@ -13,6 +15,8 @@ app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 app.config['STRIPE_SECRET_KEY'] = os.getenv('STRIPE_SECRET_KEY')
 app.config['STRIPE_PUBLIC_KEY'] = os.getenv('STRIPE_PUBLIC_KEY')
+app.config['PRELOAD_MODEL'] = os.getenv('PRELOAD_MODEL') == '1'
+app.config['LINEUP_WATCHER'] = os.getenv('LINEUP_WATCHER') == '1'
 
 # Check FLASK_DEBUG environment variable to set debug mode
 if os.getenv('FLASK_DEBUG') == '1':
@@ -23,6 +27,12 @@ app.register_blueprint(game_management_bp)
 app.register_blueprint(result_display)
 app.register_blueprint(payment_processing)
 
+# Shared model registry (set PRELOAD_MODEL=1 with gunicorn --preload to load before forking)
+model_registry.init_app(app)
+
+# Background lineup polling (LINEUP_WATCHER=1), or run python -m modules.prediction.lineup_watcher as a sidecar
+lineup_watcher.init_app(app)
+
 
 
 @app.route('/')
@@ -0,0 +1,61 @@
+# Benchmark: serial bare requests.get per boxscore vs one hydrated schedule call plus pooled concurrent
+# boxscore fallbacks, against a local stats API stub.
+# Run from the repository root: python -m benchmarks.lineup_fetching
+import time
+
+import pandas as pd
+import requests
+
+from benchmarks.statsapi_stub import start_stub_server, GAME_DATE
+from modules.prediction.lineup import fetch_starting_lineups, team_name_to_abbreviation
+from modules.prediction.statsapi import StatsApiClient, boxscore_lineup_rows, LINEUP_COLUMNS
+
+
+def legacy_fetch_starting_lineups(base_url, date):
+    # The serial, unpooled loop fetch_starting_lineups used before StatsApiClient
+    response = requests.get(f"{base_url}/schedule?sportId=1&date={date}")
+    games = response.json().get('dates', [])[0].get('games', [])
+
+    lineup_data = []
+    for game in games:
+        lineup_response = requests.get(f"{base_url}/game/{game['gamePk']}/boxscore")
+        lineup_data.extend(boxscore_lineup_rows(game['gamePk'], game['officialDate'], lineup_response.json(),
+                                                team_name_to_abbreviation))
+    return pd.DataFrame(lineup_data, columns=LINEUP_COLUMNS)
+
+
+def best_of(server, fn, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        server.request_count = 0
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), server.request_count, result
+
+
+def sorted_lineups(lineups):
+    return lineups.sort_values(by=['game_id', 'team', 'batting_order', 'player_id']).reset_index(drop=True)
+
+
+def main(latency=0.05, n_games=15, max_workers=8):
+    server, base_url = start_stub_server(latency=latency, n_games=n_games)
+    client = StatsApiClient(base_url=base_url, max_workers=max_workers)
+    print(f"{n_games} games, {latency * 1000:.0f} ms simulated latency per request")
+
+    try:
+        legacy_time, legacy_requests, legacy = best_of(
+            server, lambda: legacy_fetch_starting_lineups(base_url, GAME_DATE))
+        pooled_time, pooled_requests, pooled = best_of(
+            server, lambda: fetch_starting_lineups(GAME_DATE, client=client))
+    finally:
+        server.shutdown()
+
+    pd.testing.assert_frame_equal(sorted_lineups(legacy), sorted_lineups(pooled))
+    print(f"serial boxscores:          {legacy_time:.3f}s, {legacy_requests} requests")
+    print(f"hydrated schedule + pool:  {pooled_time:.3f}s, {pooled_requests} requests "
+          f"({legacy_time / pooled_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
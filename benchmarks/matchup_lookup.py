@@ -0,0 +1,77 @@
+# Benchmark: pitcher/batter lookups against statcast_data from 10 threads, with an ad hoc engine on an
+# unindexed database vs the pooled read-only engine from modules.prediction.database after its migration.
+# Run from the repository root: python -m benchmarks.matchup_lookup
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from modules.prediction.database import get_engine, migrate
+from modules.prediction.statcast_reader import read_statcast
+
+EVENTS = np.array(['single', 'double', 'home_run', 'walk', 'strikeout', 'field_out', None], dtype=object)
+
+
+def synthetic_statcast(rows, rng):
+    game_pk = np.sort(rng.integers(700000, 700000 + rows // 300, rows))
+    return pd.DataFrame({
+        'game_date': (pd.Timestamp('2023-04-01') + pd.to_timedelta((game_pk - 700000) // 15, unit='D')
+                      ).strftime('%Y-%m-%d 00:00:00'),
+        'game_pk': game_pk,
+        'pitcher': rng.integers(600000, 601500, rows),
+        'batter': rng.integers(650000, 653000, rows),
+        'events': EVENTS[rng.integers(0, len(EVENTS), rows)],
+        'home_team': 'NYY',
+        'away_team': 'BOS',
+        'post_home_score': rng.integers(0, 10, rows),
+        'post_away_score': rng.integers(0, 10, rows),
+        'at_bat_number': rng.integers(1, 80, rows),
+        'pitch_number': rng.integers(1, 8, rows),
+    })
+
+
+def lookup_all(engine, matchups, max_workers=10):
+    # The same fan-out matchup_test.predict_game uses: one query per (pitcher, batter) on a thread pool
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda matchup: len(read_statcast(engine, pitchers=[matchup[0]],
+                                                                   batters=[matchup[1]], store=None)),
+                                 matchups))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(rows=1000000, lookups=200):
+    rng = np.random.default_rng(42)
+    data = synthetic_statcast(rows, rng)
+    sample = rng.choice(rows, lookups, replace=False)
+    matchups = list(zip(data['pitcher'].iloc[sample].tolist(), data['batter'].iloc[sample].tolist()))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'baseball_data.db')
+        data.to_sql('statcast_data', create_engine(f'sqlite:///{path}'), index=False, chunksize=100000)
+        print(f"{rows} pitches, {lookups} matchup lookups on 10 threads")
+
+        before_time, before = timed(lambda: lookup_all(create_engine(f'sqlite:///{path}'), matchups))
+
+        migrate(get_engine(path))
+        engine = get_engine(path, read_only=True)
+        after_time, after = timed(lambda: lookup_all(engine, matchups))
+        engine.dispose()
+        get_engine(path).dispose()
+
+    assert before == after
+    print(f"ad hoc engine, no indexes:       {before_time:.3f}s ({before_time / lookups * 1000:.1f} ms/lookup)")
+    print(f"pooled read-only engine, indexed: {after_time:.3f}s ({after_time / lookups * 1000:.2f} ms/lookup, "
+          f"{before_time / after_time:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Benchmark: peak memory and throughput of preprocess_data + engineer_features vs build_features, on a
+# 50k-row training chunk and on a full synthetic season.
+# Run from the repository root: python -m benchmarks.preprocessing
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from modules.prediction.preprocessor import preprocess_data, engineer_features, build_features, FEATURE_COLUMNS
+
+TEAMS = ['ARI', 'ATL', 'BAL', 'BOS', 'CHC', 'CIN', 'CLE', 'COL', 'CWS', 'DET',
+         'HOU', 'KC', 'LAA', 'LAD', 'MIA', 'MIL', 'MIN', 'NYM', 'NYY', 'OAK',
+         'PHI', 'PIT', 'SD', 'SEA', 'SF', 'STL', 'TB', 'TEX', 'TOR', 'WSH']
+EVENTS = np.array(['single', 'double', 'triple', 'home_run', 'walk', 'strikeout', 'field_out', None], dtype=object)
+
+
+def synthetic_pitches(rows, rng, pitches_per_game=290):
+    # Shaped like a statcast_data read: int64 ids and scores, object text columns, games in pitch order
+    game_pk = 700000 + np.arange(rows) // pitches_per_game
+    pitch_in_game = np.arange(rows) % pitches_per_game
+    home = rng.integers(0, len(TEAMS), game_pk[-1] - 699999)[game_pk - 700000]
+    return pd.DataFrame({
+        'game_date': '2023-06-01 00:00:00',
+        'game_pk': game_pk,
+        'pitcher': rng.integers(600000, 601500, rows),
+        'batter': rng.integers(650000, 653000, rows),
+        'events': EVENTS[rng.integers(0, len(EVENTS), rows)],
+        'home_team': np.array(TEAMS, dtype=object)[home],
+        'away_team': np.array(TEAMS, dtype=object)[(home + 1) % len(TEAMS)],
+        'post_home_score': pitch_in_game // 40,
+        'post_away_score': pitch_in_game // 45,
+    })
+
+
+def legacy_features(df):
+    engineered = engineer_features(preprocess_data(df))
+    return engineered[['game_pk', *FEATURE_COLUMNS, 'winning_team']]
+
+
+def measure(fn, df, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def main():
+    rng = np.random.default_rng(42)
+    for label, rows in [('50k-row chunk', 50000), ('full season', 720000)]:
+        df = synthetic_pitches(rows, rng)
+        input_size = df.memory_usage(deep=True).sum()
+        legacy_time, legacy_peak, legacy = measure(legacy_features, df)
+        compact_time, compact_peak, compact = measure(build_features, df)
+
+        for column in ['game_pk', *FEATURE_COLUMNS, 'winning_team']:
+            np.testing.assert_allclose(legacy[column].to_numpy(np.float64), compact[column].to_numpy(np.float64),
+                                       rtol=1e-6)
+
+        print(f"{label}: {rows} rows, input {input_size / 2 ** 20:.1f} MiB")
+        print(f"  preprocess_data + engineer_features: {legacy_time:.3f}s, peak {legacy_peak / 2 ** 20:.1f} MiB, "
+              f"{rows / legacy_time / 1e6:.2f}M rows/s")
+        print(f"  build_features:                      {compact_time:.3f}s, peak {compact_peak / 2 ** 20:.1f} MiB, "
+              f"{rows / compact_time / 1e6:.2f}M rows/s "
+              f"({legacy_time / compact_time:.1f}x faster, {legacy_peak / compact_peak:.1f}x less memory)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Benchmark: row-wise vs vectorized schedule normalization over several synthetic seasons.
+# Run from the repository root: python -m benchmarks.schedule_normalization
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from modules.game_management.utils import normalize_schedules
+
+TEAMS = ['ARI', 'ATL', 'BAL', 'BOS', 'CHC', 'CIN', 'CLE', 'COL', 'CHW', 'DET',
+         'HOU', 'KC', 'LAA', 'LAD', 'MIA', 'MIL', 'MIN', 'NYM', 'NYY', 'OAK',
+         'PHI', 'PIT', 'SD', 'SEA', 'SF', 'STL', 'TB', 'TEX', 'TOR', 'WSN']
+
+
+def synthetic_season(year, rng):
+    # Both teams' rows for every game, in the shape schedule_and_record returns
+    rows = []
+    day = date(year, 3, 28)
+    while day <= date(year, 9, 29):
+        label = day.strftime('%A, %b %-d')
+        pairs = rng.permutation(len(TEAMS)).reshape(-1, 2)
+        for home, away in pairs:
+            attendance = 'Unknown' if rng.random() < 0.05 else f"{rng.integers(10000, 50000):,}"
+            rows.append((label, TEAMS[home], '', TEAMS[away], attendance))
+            rows.append((label, TEAMS[away], '@', TEAMS[home], attendance))
+        day += timedelta(days=1)
+    return pd.DataFrame(rows, columns=['Date', 'Tm', 'Home_Away', 'Opp', 'Attendance'])
+
+
+def legacy_normalize_schedules(all_games, year):
+    # The row-wise pipeline fetch_and_process_schedules used before normalize_schedules
+    all_games = all_games.dropna(subset=['Date', 'Tm', 'Opp'])
+    all_games['unique_id'] = all_games.apply(lambda row: row['Date'] + ''.join(sorted([row['Tm'], row['Opp']])), axis=1)
+    unique_games = all_games.drop_duplicates(subset=['unique_id'])
+    unique_games = unique_games.drop(columns=['unique_id'])
+    unique_games['Date'] = pd.to_datetime(unique_games['Date'], errors='coerce', format='%A, %b %d')
+    unique_games['Date'] = unique_games['Date'].apply(lambda d: d.replace(year=year) if not pd.isnull(d) else d)
+    unique_games_sorted = unique_games.sort_values(by='Date', ascending=True)
+    unique_games_sorted = unique_games_sorted.reset_index(drop=True)
+    unique_games_sorted['id'] = unique_games_sorted.apply(
+        lambda row: f"{row['Tm']}_{row['Opp']}_{row['Date'].strftime('%Y%m%d')}" if not pd.isnull(
+            row['Date']) else None, axis=1
+    )
+    unique_games_sorted['Attendance'] = unique_games_sorted['Attendance'].replace(r'^Unknown$', np.nan, regex=True)
+    return unique_games_sorted
+
+
+def run(normalize, seasons):
+    start = time.perf_counter()
+    results = [normalize(frame.copy(), year) for year, frame in seasons]
+    return time.perf_counter() - start, results
+
+
+def main():
+    rng = np.random.default_rng(42)
+    seasons = [(year, synthetic_season(year, rng)) for year in range(2019, 2025)]
+    total_rows = sum(len(frame) for _, frame in seasons)
+    print(f"{len(seasons)} seasons, {total_rows} schedule rows")
+
+    legacy_time, legacy_results = run(legacy_normalize_schedules, seasons)
+    vectorized_time, vectorized_results = run(normalize_schedules, seasons)
+
+    for legacy, vectorized in zip(legacy_results, vectorized_results):
+        assert set(legacy['id']) == set(vectorized['id'])
+        assert legacy['Date'].equals(vectorized['Date'])
+        assert legacy['Attendance'].isna().sum() == vectorized['Attendance'].isna().sum()
+
+    print(f"row-wise:   {legacy_time:.3f}s")
+    print(f"vectorized: {vectorized_time:.3f}s ({legacy_time / vectorized_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
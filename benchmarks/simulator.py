@@ -0,0 +1,53 @@
+# Benchmark: Monte Carlo simulation of a full 15-game slate from shrunk per-PA outcome distributions, at 10k and
+# 50k simulations per game, with a plausibility check of the simulated run environment.
+# Run from the repository root: python -m benchmarks.simulator
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.prediction.matchup_matrix import MatchupMatrix
+from modules.prediction.simulator import lineup_probabilities, simulate_games, summarize, MAX_INNINGS
+
+
+def synthetic_matchup_stats(rng, pairs=300000):
+    # matchup_stats rows with roughly league-average rates per plate appearance
+    pitcher = rng.integers(600000, 601500, pairs)
+    batter = rng.integers(650000, 653000, pairs)
+    stats = pd.DataFrame({'pitcher': pitcher, 'batter': batter}).drop_duplicates(['pitcher', 'batter'])
+    plate_appearances = rng.integers(1, 12, len(stats))
+    hits = rng.binomial(plate_appearances, 0.23)
+    walks = rng.binomial(plate_appearances - hits, 0.09)
+    return stats.assign(at_bats=plate_appearances * 4, plate_appearances=plate_appearances, hits=hits, walks=walks,
+                        total_bases=hits + rng.binomial(hits * 3, 0.22))
+
+
+def main(games=15):
+    rng = np.random.default_rng(42)
+    start = time.perf_counter()
+    matrix = MatchupMatrix(synthetic_matchup_stats(rng))
+    print(f"Matchup matrix built in {time.perf_counter() - start:.2f}s")
+
+    # One starter and nine batters per side, many of the pairs never having met
+    home_pitchers, away_pitchers = rng.integers(600000, 601500, games), rng.integers(600000, 601500, games)
+    home_lineups = [rng.integers(650000, 653000, 9) for _ in range(games)]
+    away_lineups = [rng.integers(650000, 653000, 9) for _ in range(games)]
+
+    for n_simulations in (10000, 50000):
+        start = time.perf_counter()
+        home_probabilities, home_sizes = lineup_probabilities(matrix, away_pitchers, home_lineups)
+        away_probabilities, away_sizes = lineup_probabilities(matrix, home_pitchers, away_lineups)
+        home_runs, away_runs = simulate_games(home_probabilities, away_probabilities, home_sizes, away_sizes,
+                                              n_simulations=n_simulations, random_state=42)
+        results = [summarize(home_runs[i], away_runs[i]) for i in range(games)]
+        elapsed = time.perf_counter() - start
+
+        print(f"{games} games x {n_simulations} simulations: {elapsed:.2f}s "
+              f"({games * n_simulations / elapsed / 1e3:.0f}k games/s)")
+        print(f"  runs per game {np.mean([result['expected_total_runs'] for result in results]):.2f}, "
+              f"home win {np.mean([result['home_win_prob'] for result in results]):.3f}, "
+              f"tied after {MAX_INNINGS} innings {np.mean(home_runs == away_runs):.4f}")
+
+
+if __name__ == "__main__":
+    main()
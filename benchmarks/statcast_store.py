@@ -0,0 +1,84 @@
+# Benchmark: a one-month backtest read from statcast_data in SQLite vs the partitioned Parquet store,
+# over a synthetic season with statcast's column width.
+# Run from the repository root: python -m benchmarks.statcast_store
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from modules.prediction.preprocessor import RELEVANT_COLUMNS
+from modules.prediction.statcast_reader import read_statcast
+from modules.prediction.statcast_store import StatcastStore
+
+TEAMS = ['ARI', 'ATL', 'BAL', 'BOS', 'CHC', 'CIN', 'CLE', 'COL', 'CWS', 'DET',
+         'HOU', 'KC', 'LAA', 'LAD', 'MIA', 'MIL', 'MIN', 'NYM', 'NYY', 'OAK',
+         'PHI', 'PIT', 'SD', 'SEA', 'SF', 'STL', 'TB', 'TEX', 'TOR', 'WSH']
+EVENTS = np.array(['single', 'double', 'triple', 'home_run', 'walk', 'strikeout', 'field_out', None], dtype=object)
+
+# Pitch-level measurements statcast returns alongside the columns the pipeline reads
+EXTRA_COLUMNS = 80
+
+
+def synthetic_day(day, first_game_pk, rng, pitches_per_game=290):
+    n_games = len(TEAMS) // 2
+    rows = n_games * pitches_per_game
+    game_pk = np.repeat(np.arange(first_game_pk, first_game_pk + n_games), pitches_per_game)
+    home = rng.permutation(len(TEAMS))[:n_games]
+    away = (home + 1) % len(TEAMS)
+    pitch_in_game = np.tile(np.arange(pitches_per_game), n_games)
+    df = pd.DataFrame({
+        'game_date': pd.Timestamp(day),
+        'game_pk': game_pk,
+        'pitcher': rng.integers(600000, 601500, rows),
+        'batter': rng.integers(650000, 653000, rows),
+        'events': EVENTS[rng.integers(0, len(EVENTS), rows)],
+        'home_team': np.array(TEAMS)[np.repeat(home, pitches_per_game)],
+        'away_team': np.array(TEAMS)[np.repeat(away, pitches_per_game)],
+        'post_home_score': pitch_in_game // 40,
+        'post_away_score': pitch_in_game // 45,
+        'at_bat_number': pitch_in_game // 4 + 1,
+        'pitch_number': pitch_in_game % 4 + 1,
+    })
+    extras = pd.DataFrame(rng.random((rows, EXTRA_COLUMNS)), columns=[f'measure_{i}' for i in range(EXTRA_COLUMNS)])
+    return pd.concat([df, extras], axis=1)
+
+
+def best_of(fn, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(days=90):
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'statcast.db')}")
+        store = StatcastStore(os.path.join(directory, 'statcast_parquet'))
+
+        season = pd.date_range('2023-04-01', periods=days, freq='D')
+        for i, day in enumerate(season):
+            day_data = synthetic_day(day, 700000 + i * 100, rng)
+            day_data.to_sql('statcast_data', engine, if_exists='append', index=False)
+            store.write_day(day, day_data)
+        print(f"{days} days, {len(day_data) * days} pitches, {len(day_data.columns)} columns")
+
+        start_date, end_date = '2023-06-01', '2023-06-30'
+        sqlite_time, from_sqlite = best_of(lambda: read_statcast(engine, RELEVANT_COLUMNS, start_date, end_date,
+                                                                 store=None))
+        parquet_time, from_parquet = best_of(lambda: read_statcast(engine, RELEVANT_COLUMNS, start_date, end_date,
+                                                                   store=store))
+
+    assert from_sqlite['game_pk'].tolist() == from_parquet['game_pk'].tolist()
+    print(f"one month, {len(from_parquet)} rows")
+    print(f"sqlite:  {sqlite_time:.3f}s")
+    print(f"parquet: {parquet_time:.3f}s ({sqlite_time / parquet_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Local stand-in for the MLB stats API, serving synthetic schedule and boxscore payloads with fixed latency.
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+TEAM_NAMES = ['Arizona Diamondbacks', 'Atlanta Braves', 'Baltimore Orioles', 'Boston Red Sox', 'Chicago Cubs',
+              'Cincinnati Reds', 'Cleveland Guardians', 'Colorado Rockies', 'Chicago White Sox', 'Detroit Tigers',
+              'Houston Astros', 'Kansas City Royals', 'Los Angeles Angels', 'Los Angeles Dodgers', 'Miami Marlins',
+              'Milwaukee Brewers', 'Minnesota Twins', 'New York Mets', 'New York Yankees', 'Oakland Athletics',
+              'Philadelphia Phillies', 'Pittsburgh Pirates', 'San Diego Padres', 'Seattle Mariners',
+              'San Francisco Giants', 'St. Louis Cardinals', 'Tampa Bay Rays', 'Texas Rangers', 'Toronto Blue Jays',
+              'Washington Nationals']
+
+GAME_DATE = '2024-06-09'
+FIRST_GAME_PK = 745000
+
+
+def game_teams(game_pk):
+    index = (game_pk - FIRST_GAME_PK) * 2
+    return TEAM_NAMES[index], TEAM_NAMES[index + 1]
+
+
+def player_id(game_pk, side, slot):
+    return (game_pk - FIRST_GAME_PK) * 100 + (0 if side == 'home' else 50) + slot + 600000
+
+
+def schedule_payload(n_games=15, hydrated=False):
+    games = []
+    for game_pk in range(FIRST_GAME_PK, FIRST_GAME_PK + n_games):
+        home, away = game_teams(game_pk)
+        game = {'gamePk': game_pk, 'officialDate': GAME_DATE, 'gameDate': f'{GAME_DATE}T23:05:00Z',
+                'teams': {'home': {'team': {'name': home}}, 'away': {'team': {'name': away}}}}
+        # Every third game has not posted its lineups yet, so clients have to fall back to its boxscore
+        if hydrated and game_pk % 3 != 0:
+            game['lineups'] = {}
+            for side in ['home', 'away']:
+                pitcher_id = player_id(game_pk, side, 0)
+                game['teams'][side]['probablePitcher'] = {'id': pitcher_id, 'fullName': f'Player {pitcher_id}'}
+                game['lineups'][f'{side}Players'] = [
+                    {'id': player_id(game_pk, side, slot), 'fullName': f'Player {player_id(game_pk, side, slot)}',
+                     'primaryPosition': {'abbreviation': 'RF'}}
+                    for slot in range(1, 10)]
+        games.append(game)
+    return {'dates': [{'date': GAME_DATE, 'games': games}]}
+
+
+def boxscore_payload(game_pk):
+    teams = {}
+    for side, name in zip(['home', 'away'], game_teams(game_pk)):
+        players = {}
+        # Nine starters, a starting pitcher and a bench
+        for slot in range(26):
+            person_id = player_id(game_pk, side, slot)
+            player = {'person': {'id': person_id, 'fullName': f'Player {person_id}'},
+                      'position': {'abbreviation': 'P' if slot == 0 else 'RF'}}
+            if 1 <= slot <= 9:
+                player['battingOrder'] = str(slot * 100)
+            players[f'ID{person_id}'] = player
+        teams[side] = {'team': {'name': name}, 'pitchers': [player_id(game_pk, side, 0)], 'players': players}
+    return {'teams': teams}
+
+
+class StatsApiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.05
+    n_games = 15
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        path = url.path
+        boxscore = re.match(r'^/api/v1/game/(\d+)/boxscore$', path)
+        if path == '/api/v1/schedule':
+            payload = schedule_payload(self.n_games, hydrated='hydrate' in parse_qs(url.query))
+        elif boxscore:
+            payload = boxscore_payload(int(boxscore.group(1)))
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(payload).encode()
+        # Payloads are deterministic, so a content hash doubles as the ETag
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Count requests instead of logging them
+        self.server.request_count += 1
+
+
+def start_stub_server(latency=0.05, n_games=15):
+    handler = type('Handler', (StatsApiStubHandler,), {'latency': latency, 'n_games': n_games})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/api/v1'
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from .utils import cache_file, get_or_update_schedules, refresh_schedules_in_background, schedule_ids
+
+
+class ScheduleStore:
+    """Parsed game_schedules.json indexed by date and by game id, reloaded only when the file changes."""
+
+    def __init__(self, path=cache_file, max_age=timedelta(days=1)):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._by_date = {}
+        self._by_id = {}
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _build_indexes(self, schedules):
+        dates = schedules['Date']
+        ids = schedules['id'] if 'id' in schedules.columns else schedule_ids(schedules)
+        games = pd.DataFrame({
+            'id': ids,
+            'away_team': schedules['Opp'],
+            'home_team': schedules['Tm'],
+            'formatted_date': dates.dt.strftime('%Y-%m-%d').fillna('Unknown Date'),
+        }).to_dict('records')
+
+        by_date = defaultdict(list)
+        for game, day in zip(games, dates.dt.date):
+            if not pd.isnull(day):
+                by_date[day].append(game)
+
+        by_id = {game['id']: game for game in games if game['id'] is not None}
+        return dict(by_date), by_id
+
+    def _reload_if_changed(self):
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            schedules = pd.read_json(self.path, convert_dates=['Date'])
+            # Swap both indexes at once so readers never see a mix of old and new schedules
+            self._by_date, self._by_id = self._build_indexes(schedules)
+            self._mtime = mtime
+
+    def refresh(self, year):
+        # Same daily refresh policy as get_or_update_schedules, without re-parsing an unchanged file.
+        # A stale file keeps being served while a background thread refetches it.
+        mtime = self._file_mtime()
+        if mtime is None:
+            get_or_update_schedules(year)
+        elif datetime.now() - datetime.fromtimestamp(mtime / 1e9) >= self.max_age:
+            refresh_schedules_in_background(year)
+        self._reload_if_changed()
+
+    def games_on(self, day):
+        self.refresh(day.year)
+        return list(self._by_date.get(day, []))
+
+    def get_games(self, game_ids):
+        self._reload_if_changed()
+        return [self._by_id[game_id] for game_id in game_ids if game_id in self._by_id]
+
+
+schedule_store = ScheduleStore()
@@ -1,13 +1,28 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pandas as pd
 from pybaseball import schedule_and_record
 import requests
 import numpy as np
 
+from modules.prediction.http_cache import response_cache
+
 # Define the cache file location
 cache_file = 'game_schedules.json'
 
+# Last good schedule per team, reused when that team's fetch fails
+fragment_dir = 'schedule_fragments'
+
+_refresh_lock = threading.Lock()
+
+# A stale file is refreshed at most this often (seconds), so a failing upstream is not re-fetched on every request
+REFRESH_BACKOFF = int(os.getenv('SCHEDULE_REFRESH_BACKOFF', 15 * 60))
+# time.monotonic() of the last background refresh started in this process, successful or not
+_last_refresh_attempt = None
+
 # Dictionary to map full team names to abbreviations
 team_name_to_abbreviation = {
     'Arizona Diamondbacks': 'ARI', 'Atlanta Braves': 'ATL', 'Baltimore Orioles': 'BAL', 'Boston Red Sox': 'BOS',
@@ -21,7 +36,26 @@ team_name_to_abbreviation = {
 }
 
 
-def fetch_and_process_schedules(year):
+def fetch_team_schedule(year, team):
+    # JSON with its table schema rather than a pickle: the fragments are read back inside the web process
+    fragment_file = os.path.join(fragment_dir, f'{year}_{team}.json')
+    try:
+        # Served from the shared response cache while fresh, so repeated refreshes skip Baseball Reference
+        team_schedule = response_cache.cached_frame(f'pybaseball:schedule_and_record:{year}:{team}',
+                                                    lambda: schedule_and_record(year, team))
+        os.makedirs(fragment_dir, exist_ok=True)
+        team_schedule.to_json(f'{fragment_file}.tmp', orient='table', date_format='iso')
+        os.replace(f'{fragment_file}.tmp', fragment_file)
+        return team_schedule
+    except Exception as e:
+        if os.path.exists(fragment_file):
+            print(f"Failed to retrieve schedule for {team}: {e}. Using cached schedule.")
+            return pd.read_json(fragment_file, orient='table')
+        print(f"Failed to retrieve schedule for {team}: {e}")
+        return None
+
+
+def fetch_and_process_schedules(year, max_workers=8):
     team_abbreviations = [
         'ARI', 'ATL', 'BAL', 'BOS', 'CHC',
         'CIN', 'CLE', 'COL', 'CHW', 'DET',
@@ -31,48 +65,89 @@ def fetch_and_process_schedules(year):
         'STL', 'TB', 'TEX', 'TOR', 'WSN'
     ]
 
-    all_games = pd.DataFrame()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        team_schedules = list(executor.map(lambda team: fetch_team_schedule(year, team), team_abbreviations))
+
+    all_games = pd.concat([schedule for schedule in team_schedules if schedule is not None], ignore_index=True)
+
+    return normalize_schedules(all_games, year)
+
+
+def schedule_ids(schedules):
+    # "<Tm>_<Opp>_<YYYYMMDD>", or None when the date could not be parsed. Each distinct date
+    # (a few hundred per season) is formatted once and broadcast back to the rows.
+    codes, dates = pd.factorize(schedules['Date'])
+    day_labels = np.append(dates.strftime('%Y%m%d').to_numpy(dtype=object), '')
+    ids = schedules['Tm'] + '_' + schedules['Opp'] + '_' + day_labels[codes]
+    return ids.where(codes >= 0, None)
 
-    for team in team_abbreviations:
-        try:
-            team_schedule = schedule_and_record(year, team)
-            all_games = pd.concat([all_games, team_schedule], ignore_index=True)
-        except Exception as e:
-            print(f"Failed to retrieve schedule for {team}: {e}")
 
+def normalize_schedules(all_games, year):
+    # Vectorized dedup/date/id pipeline; every step works on whole columns
     all_games = all_games.dropna(subset=['Date', 'Tm', 'Opp'])
-    all_games['unique_id'] = all_games.apply(lambda row: row['Date'] + ''.join(sorted([row['Tm'], row['Opp']])), axis=1)
-    unique_games = all_games.drop_duplicates(subset=['unique_id'])
-    unique_games = unique_games.drop(columns=['unique_id'])
-    unique_games['Date'] = pd.to_datetime(unique_games['Date'], errors='coerce', format='%A, %b %d')
-    unique_games['Date'] = unique_games['Date'].apply(lambda d: d.replace(year=year) if not pd.isnull(d) else d)
+
+    # A game appears once in each team's schedule; the date plus the ordered team pair identifies it
+    teams = all_games['Tm'].to_numpy(dtype=object)
+    opponents = all_games['Opp'].to_numpy(dtype=object)
+    unique_id = all_games['Date'] + np.minimum(teams, opponents) + np.maximum(teams, opponents)
+    unique_games = all_games[~unique_id.duplicated()].copy()
+
+    # Dates look like "Wednesday, Mar 20"; parse them with the season year appended
+    unique_games['Date'] = pd.to_datetime(unique_games['Date'] + f' {year}', errors='coerce', format='%A, %b %d %Y')
     unique_games_sorted = unique_games.sort_values(by='Date', ascending=True)
     unique_games_sorted = unique_games_sorted.reset_index(drop=True)
-    unique_games_sorted['id'] = unique_games_sorted.apply(
-        lambda row: f"{row['Tm']}_{row['Opp']}_{row['Date'].strftime('%Y%m%d')}" if not pd.isnull(
-            row['Date']) else None, axis=1
-    )
-    unique_games_sorted['Attendance'].replace(r'^Unknown$', np.nan, regex=True,
-                                              inplace=True)  # Convert 'Unknown' to NaN
+    unique_games_sorted['id'] = schedule_ids(unique_games_sorted)
+
+    # Convert 'Unknown' to NaN
+    unique_games_sorted['Attendance'] = unique_games_sorted['Attendance'].mask(
+        unique_games_sorted['Attendance'] == 'Unknown')
 
     return unique_games_sorted
 
 
+def write_schedules(schedules):
+    # Write then rename, so readers never parse a half-written file
+    schedules.to_json(f'{cache_file}.tmp', date_format='iso')
+    os.replace(f'{cache_file}.tmp', cache_file)
+
+
+def refresh_schedules(year):
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        write_schedules(fetch_and_process_schedules(year))
+    except Exception as e:
+        print(f"Failed to refresh schedules: {e}")
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_schedules_in_background(year):
+    # At most one refresh runs at a time, and none within REFRESH_BACKOFF of the last attempt; requests keep
+    # serving the current file meanwhile
+    global _last_refresh_attempt
+    if _refresh_lock.locked():
+        return
+    if _last_refresh_attempt is not None and time.monotonic() - _last_refresh_attempt < REFRESH_BACKOFF:
+        return
+    _last_refresh_attempt = time.monotonic()
+    threading.Thread(target=refresh_schedules, args=(year,), daemon=True).start()
+
+
 def get_or_update_schedules(year):
     if os.path.exists(cache_file):
         modified_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-        if datetime.now() - modified_time < timedelta(days=1):
-            with open(cache_file, 'r') as file:
-                schedules = pd.read_json(file, convert_dates=['Date'])
-                if 'id' not in schedules.columns:
-                    schedules['id'] = schedules.apply(
-                        lambda row: f"{row['Tm']}_{row['Opp']}_{row['Date'].strftime('%Y%m%d')}" if not pd.isnull(
-                            row['Date']) else None, axis=1
-                    )
-                schedules['Attendance'].replace(r'^Unknown$', np.nan, regex=True,
-                                                inplace=True)  # Convert 'Unknown' to NaN
-                return schedules
+        if datetime.now() - modified_time >= timedelta(days=1):
+            refresh_schedules_in_background(year)
+        with open(cache_file, 'r') as file:
+            schedules = pd.read_json(file, convert_dates=['Date'])
+            if 'id' not in schedules.columns:
+                schedules['id'] = schedule_ids(schedules)
+            # Convert 'Unknown' to NaN
+            schedules['Attendance'] = schedules['Attendance'].mask(schedules['Attendance'] == 'Unknown')
+            return schedules
 
+    # Nothing to serve yet, so the first fetch has to happen inline
     schedules = fetch_and_process_schedules(year)
-    schedules.to_json(cache_file, date_format='iso')
+    write_schedules(schedules)
     return schedules
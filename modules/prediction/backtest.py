@@ -1,32 +1,25 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
 from sklearn.metrics import accuracy_score
-import joblib
 
-from modules.prediction.preprocessor import preprocess_data, engineer_features
-
-DATABASE_FILE = 'baseball_data.db'
-MODEL_CACHE_FILE = 'trained_model.joblib'
+from modules.prediction.database import get_engine
+from modules.prediction.game_results import ensure_game_results, load_game_labels
+from modules.prediction.preprocessor import build_features, RELEVANT_COLUMNS, FEATURE_COLUMNS
+from modules.prediction.statcast_reader import read_statcast
+from modules.prediction.registry import model_registry
 
 def fetch_historical_data(engine, start_date, end_date):
-    query = f"""
-    SELECT game_date, game_pk, pitcher, batter, events, home_team, away_team,
-           post_home_score, post_away_score
-    FROM statcast_data
-    WHERE game_date BETWEEN '{start_date}' AND '{end_date}'
-    """
-    return pd.read_sql(query, engine)
+    # Only the pipeline's columns for the date range; served from the Parquet store when it exists
+    return read_statcast(engine, columns=RELEVANT_COLUMNS, start_date=start_date, end_date=end_date)
 
 
-def backtest_model(model, historical_data):
-    # Apply your existing preprocessing and feature engineering functions
-    preprocessed_data = preprocess_data(historical_data)
-    feature_engineered_data = engineer_features(preprocessed_data)
+def backtest_model(model, historical_data, labels=None):
+    # Same features and labels the model was trained on
+    features = build_features(historical_data, labels=labels)
 
     # Prepare data for prediction
-    X = feature_engineered_data[['batting_average', 'on_base_percentage', 'total_bases', 'is_home']]
-    y_true = feature_engineered_data['winning_team']
+    X = features[FEATURE_COLUMNS]
+    y_true = features['winning_team']
 
     # Debug: Check the distribution of y_true
     print("Distribution of y_true labels:")
@@ -50,14 +43,25 @@ def backtest_model(model, historical_data):
     return y_true, y_pred, y_pred_proba
 
 
-# Example usage
-engine = create_engine(f'sqlite:///{DATABASE_FILE}')
+def main():
+    ensure_game_results(get_engine())
+    engine = get_engine(read_only=True)
+
+    # Fetch historical data (e.g., June 2023)
+    start_date, end_date = '2023-06-01', '2023-06-30'
+    historical_data = fetch_historical_data(engine, start_date, end_date)
+    labels = load_game_labels(engine, start_date, end_date)
+
+    # Load the pre-trained model
+    model, version = model_registry.get()
+    if model is None:
+        print("No trained model found. Run matchup_model first.")
+        return
+    print(f"Backtesting model {version}")
 
-# Fetch historical data (e.g., June 2023)
-historical_data = fetch_historical_data(engine, '2023-06-01', '2023-06-30')
+    # Backtest the model
+    backtest_model(model, historical_data, labels)
 
-# Load the pre-trained model
-model = joblib.load(MODEL_CACHE_FILE)
 
-# Backtest the model
-y_true, y_pred, y_pred_proba = backtest_model(model, historical_data)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Set PREDICTION_CACHE_DB to a file path to share cached predictions between worker processes
+PREDICTION_CACHE_DB = os.getenv('PREDICTION_CACHE_DB')
+
+NO_LINEUP = 'none'
+
+# Baseball-Reference codes used by the schedules that differ from the stats API's, which lineups use
+LINEUP_ABBREVIATIONS = {'KCR': 'KC', 'SDP': 'SD', 'SFG': 'SF', 'TBR': 'TB'}
+
+
+def lineup_abbreviation(team):
+    # A schedule's team code as it appears in the lineups' team_abbr column
+    return LINEUP_ABBREVIATIONS.get(team, team)
+
+
+def lineup_fingerprint(lineups, teams):
+    # Stable hash of the confirmed lineups for a game's teams, in batting order. Teams may be given with
+    # either the schedule's or the lineups' codes.
+    if lineups is None or lineups.empty:
+        return NO_LINEUP
+    game_lineups = lineups[lineups['team_abbr'].isin([lineup_abbreviation(team) for team in teams])]
+    if game_lineups.empty:
+        return NO_LINEUP
+    game_lineups = game_lineups.sort_values(by=['team_abbr', 'batting_order'])
+    payload = ','.join(f"{team}:{player}" for team, player in zip(game_lineups['team_abbr'], game_lineups['player_id']))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def game_lineup_hash(fingerprints, teams):
+    # A game's lineup part of the cache key, from per-team fingerprints keyed by the lineups' team codes
+    parts = [fingerprints.get(lineup_abbreviation(team), NO_LINEUP) for team in teams]
+    return NO_LINEUP if all(part == NO_LINEUP for part in parts) else ':'.join(parts)
+
+
+class SQLiteCacheBackend:
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS prediction_cache (
+                    game_id TEXT NOT NULL,
+                    lineup_hash TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (game_id, lineup_hash, model_version)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lineup_snapshot (
+                    team TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    day TEXT NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits or rolls back; the connection is closed here
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM prediction_cache "
+                               "WHERE game_id = ? AND lineup_hash = ? AND model_version = ? AND expires_at > ?",
+                               (*key, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE prediction_cache SET last_access = ? "
+                         "WHERE game_id = ? AND lineup_hash = ? AND model_version = ?", (now, *key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?, ?, ?)",
+                         (*key, json.dumps(value), expires_at, now))
+            conn.execute("DELETE FROM prediction_cache WHERE expires_at <= ?", (now,))
+            # Least recently used entries go first once the table is over its size limit
+            conn.execute("DELETE FROM prediction_cache WHERE rowid IN ("
+                         "SELECT rowid FROM prediction_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                         (self.max_entries,))
+
+    def invalidate_game(self, game_id, keep_lineup_hash=None):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM prediction_cache WHERE game_id = ? AND lineup_hash IS NOT ?",
+                         (game_id, keep_lineup_hash))
+
+    def publish_lineups(self, day, fingerprints):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM lineup_snapshot")
+            conn.executemany("INSERT INTO lineup_snapshot VALUES (?, ?, ?)",
+                             [(team, fingerprint, day) for team, fingerprint in fingerprints.items()])
+
+    def lineup_snapshot(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT team, fingerprint, day FROM lineup_snapshot").fetchall()
+        return (rows[0][2] if rows else None), {team: fingerprint for team, fingerprint, _ in rows}
+
+
+class PredictionCache:
+    """TTL + LRU cache of game predictions keyed by (game id, lineup hash, model version)."""
+
+    def __init__(self, ttl=900, max_entries=1024, backend=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lineups = {}
+        # (day, {team: fingerprint}) last published by the lineup watcher
+        self._lineup_snapshot = (None, {})
+        self._lock = threading.RLock()
+
+    def _check_lineup(self, game_id, lineup_hash):
+        # A new confirmed lineup makes every entry for the game stale, whatever the model version
+        if self._lineups.get(game_id, lineup_hash) != lineup_hash:
+            self.invalidate_game(game_id, keep_lineup_hash=lineup_hash)
+        self._lineups[game_id] = lineup_hash
+
+    def get(self, game_id, lineup_hash, model_version):
+        key = (str(game_id), lineup_hash, str(model_version))
+        with self._lock:
+            self._check_lineup(key[0], lineup_hash)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        if self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                with self._lock:
+                    self._store(key, *entry)
+                return entry[0]
+
+        return None
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, game_id, lineup_hash, model_version, value):
+        key = (str(game_id), lineup_hash, str(model_version))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._check_lineup(key[0], lineup_hash)
+            self._store(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(key, value, expires_at)
+
+    def get_or_compute(self, game_id, lineup_hash, model_version, compute):
+        value = self.get(game_id, lineup_hash, model_version)
+        if value is None:
+            value = compute()
+            self.set(game_id, lineup_hash, model_version, value)
+        return value
+
+    def invalidate_game(self, game_id, keep_lineup_hash=None):
+        game_id = str(game_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == game_id and key[1] != keep_lineup_hash]:
+                del self._entries[key]
+        if self.backend is not None:
+            self.backend.invalidate_game(game_id, keep_lineup_hash)
+
+    def publish_lineups(self, day, fingerprints):
+        # The lineup watcher's latest per-team fingerprints. Page requests build their keys from them instead of
+        # fetching lineups themselves; the backend shares them with other processes (e.g. a sidecar watcher).
+        self._lineup_snapshot = (str(day), dict(fingerprints))
+        if self.backend is not None:
+            self.backend.publish_lineups(str(day), fingerprints)
+
+    def lineup_fingerprints(self, day):
+        # Fingerprints published for the given day, or none yet
+        snapshot = self.backend.lineup_snapshot() if self.backend is not None else self._lineup_snapshot
+        return snapshot[1] if snapshot[0] == str(day) else {}
+
+
+prediction_cache = PredictionCache(
+    backend=SQLiteCacheBackend(PREDICTION_CACHE_DB) if PREDICTION_CACHE_DB else None)
@@ -1,9 +1,38 @@
 from pybaseball import statcast
-import pandas as pd
-import sqlite3
-from datetime import timedelta, date
+from sqlalchemy import text
+from datetime import timedelta, date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
 import time
 
+from modules.prediction.database import get_engine, has_table, migrate
+from modules.prediction.game_results import update_game_results
+from modules.prediction.matchup_stats import update_matchup_stats
+from modules.prediction.player_embeddings import refit_embeddings
+from modules.prediction.statcast_store import statcast_store
+
+DEFAULT_START_DATE = date(2021, 4, 1)
+
+# Statcast can publish a day late, so empty results this recent are not recorded as loaded
+RECENT_DAYS = 3
+
+# One row per game date that has been committed to statcast_data, including off days
+CREATE_LOAD_LOG = """
+CREATE TABLE IF NOT EXISTS statcast_load_log (
+    game_date TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL,
+    loaded_at TEXT NOT NULL
+)
+"""
+
+# A database filled before the log existed already holds these dates
+SEED_LOAD_LOG = """
+INSERT INTO statcast_load_log (game_date, row_count, loaded_at)
+SELECT substr(game_date, 1, 10), COUNT(*), :loaded_at
+FROM statcast_data
+GROUP BY 1
+"""
+
 
 def daterange(start_date, end_date):
     for n in range(int((end_date - start_date).days) + 1):
@@ -25,19 +54,109 @@ def fetch_data_for_date(single_date, retries=5, wait_time=10):
     return None
 
 
-start_date = date(2021, 4, 1)
-end_date = date(2024, 10, 5)
+def ensure_load_log(conn):
+    # Created on first use and seeded from statcast_data, so an existing database's dates are not fetched and
+    # appended a second time
+    if has_table(conn, 'statcast_load_log'):
+        return
+    conn.execute(text(CREATE_LOAD_LOG))
+    if has_table(conn, 'statcast_data'):
+        conn.execute(text(SEED_LOAD_LOG), {'loaded_at': datetime.now().isoformat(timespec='seconds')})
+
+
+def get_loaded_dates(engine):
+    with engine.begin() as conn:
+        ensure_load_log(conn)
+        rows = conn.execute(text("SELECT game_date FROM statcast_load_log")).fetchall()
+    return {row[0] for row in rows}
+
+
+def get_watermark(engine):
+    # Latest game date committed to statcast_data, or None for an empty database
+    with engine.begin() as conn:
+        ensure_load_log(conn)
+        watermark = conn.execute(text("SELECT MAX(game_date) FROM statcast_load_log")).scalar()
+    return date.fromisoformat(watermark) if watermark else None
+
+
+def store_day(engine, single_date, day_data, store=None):
+    # Rows, aggregates and the load log entry commit together, so a crash never leaves a half-loaded day
+    has_rows = day_data is not None and not day_data.empty
+    if not has_rows and (date.today() - single_date).days < RECENT_DAYS:
+        return 0
+
+    # The day's Parquet partition is replaced before the commit, so a failed commit is redone on the next run
+    if has_rows and store is not None:
+        store.write_day(single_date, day_data)
+
+    with engine.begin() as conn:
+        if has_rows:
+            day_data.to_sql('statcast_data', conn, if_exists='append', index=False)
+            update_matchup_stats(conn, day_data)
+            update_game_results(conn, day_data)
+        conn.execute(text("INSERT OR REPLACE INTO statcast_load_log (game_date, row_count, loaded_at) "
+                          "VALUES (:game_date, :row_count, :loaded_at)"),
+                     {'game_date': single_date.isoformat(),
+                      'row_count': len(day_data) if has_rows else 0,
+                      'loaded_at': datetime.now().isoformat(timespec='seconds')})
+    return len(day_data) if has_rows else 0
+
+
+def ingest(engine, start_date, end_date, max_workers=4):
+    loaded_dates = get_loaded_dates(engine)
+    pending_dates = [d for d in daterange(start_date, end_date) if d.isoformat() not in loaded_dates]
+
+    if not pending_dates:
+        print(f"All dates from {start_date} to {end_date} are already loaded.")
+        return 0
+
+    # Readers switch to the Parquet store as soon as it exists, so it only starts out empty alongside an
+    # empty database; an existing database is copied over first with python -m modules.prediction.statcast_store
+    store = statcast_store if statcast_store.exists() or not loaded_dates else None
+    if store is None:
+        print(f"Not writing to {statcast_store.root}: export the existing statcast_data into it first.")
+
+    print(f"Fetching {len(pending_dates)} dates with {max_workers} workers...")
+    total_rows = 0
+
+    # Workers only fetch; this thread is the single SQLite writer and commits each day as it arrives
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_date = {executor.submit(fetch_data_for_date, d): d for d in pending_dates}
+
+        for future in as_completed(future_to_date):
+            single_date = future_to_date[future]
+            day_data = future.result()
+            if day_data is None:
+                print(f"No data stored for {single_date}; it will be retried on the next run.")
+                continue
+
+            rows = store_day(engine, single_date, day_data, store=store)
+            total_rows += rows
+            print(f"Stored {rows} rows for {single_date.strftime('%Y-%m-%d')}")
+
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load statcast data into baseball_data.db")
+    parser.add_argument('--start', type=date.fromisoformat, default=DEFAULT_START_DATE,
+                        help="first game date to load (YYYY-MM-DD)")
+    parser.add_argument('--end', type=date.fromisoformat, default=date.today() - timedelta(days=1),
+                        help="last game date to load (YYYY-MM-DD), defaults to yesterday")
+    parser.add_argument('--workers', type=int, default=4, help="number of concurrent statcast requests")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    print(f"Current watermark: {get_watermark(engine)}")
 
-all_data = pd.DataFrame()
+    total_rows = ingest(engine, args.start, args.end, max_workers=args.workers)
+    migrate(engine)
+    if total_rows:
+        refit_embeddings(engine)
 
-for single_date in daterange(start_date, end_date):
-    print(f"Fetching data for {single_date.strftime('%Y-%m-%d')}")
-    day_data = fetch_data_for_date(single_date)
-    if day_data is not None and not day_data.empty:
-        all_data = pd.concat([all_data, day_data], ignore_index=True)
+    print(f"Data fetching and storage complete. {total_rows} rows added, "
+          f"watermark is now {get_watermark(engine)}.")
 
-conn = sqlite3.connect('baseball_data.db')
-all_data.to_sql('statcast_data', conn, if_exists='append', index=False)
-conn.close()
 
-print("Data fetching and storage complete.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import threading
+
+from sqlalchemy import create_engine, event, text
+
+DATABASE_FILE = 'baseball_data.db'
+
+# Applied to every new connection. WAL lets readers run alongside the loader's writes; mmap and a larger
+# page cache keep hot index pages in memory instead of re-reading them through the file API.
+PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+# Pitch-order index the chunked reader paginates on; its game_pk prefix also serves plain game_pk lookups
+CREATE_GAME_INDEX = ("CREATE INDEX IF NOT EXISTS idx_statcast_game "
+                     "ON statcast_data (game_pk, at_bat_number, pitch_number)")
+
+STATCAST_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_statcast_pitcher_batter ON statcast_data (pitcher, batter)",
+    "CREATE INDEX IF NOT EXISTS idx_statcast_game_date ON statcast_data (game_date)",
+    CREATE_GAME_INDEX,
+]
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _configure(engine, read_only):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        else:
+            cursor.execute("PRAGMA journal_mode = WAL")
+        for name, value in PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def get_engine(path=DATABASE_FILE, read_only=False, pool_size=10):
+    # One engine per process and mode; a forked worker builds its own instead of sharing the parent's pool
+    key = (os.getpid(), os.path.abspath(path), read_only)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            if read_only:
+                # Opened through a URI so SQLite itself rejects writes from prediction threads
+                url = f'sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true'
+            else:
+                url = f'sqlite:///{path}'
+            engine = create_engine(url, pool_size=pool_size, max_overflow=pool_size)
+            _configure(engine, read_only)
+            _engines[key] = engine
+    return engine
+
+
+def has_table(conn, name):
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': name}).fetchone() is not None
+
+
+def migrate(engine):
+    # Idempotent; a database without statcast_data yet gets its indexes on the next run
+    with engine.begin() as conn:
+        if not has_table(conn, 'statcast_data'):
+            return
+        for statement in STATCAST_INDEXES:
+            conn.execute(text(statement))
+        conn.execute(text("ANALYZE statcast_data"))
+
+
+def main():
+    # python -m modules.prediction.database
+    engine = get_engine()
+    print(f"Creating indexes on {DATABASE_FILE}...")
+    migrate(engine)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
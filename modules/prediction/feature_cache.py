@@ -0,0 +1,142 @@
+"""On-disk training matrix, built once and then extended with the rows of newly loaded dates.
+
+build_features aggregates pitcher-batter stats within each chunk it is given. A full build reads the table in
+game-aligned chunks, but appended rows are chunked from the new dates alone, so their matchup features come from
+partial aggregates and differ from what a full rebuild of the same data would give. The cache key records the date
+the matrix was last fully built through, so the two are never confused; rebuild with
+python -m modules.prediction.feature_cache --rebuild.
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from modules.prediction.data_loader import get_loaded_dates
+from modules.prediction.database import get_engine
+from modules.prediction.game_results import ensure_game_results, load_game_labels
+from modules.prediction.preprocessor import build_features, FEATURE_COLUMNS, FEATURE_VERSION
+from modules.prediction.statcast_reader import iter_statcast_chunks
+
+FEATURE_CACHE_DIR = os.getenv('FEATURE_CACHE_DIR', 'feature_cache')
+
+# Raw little-endian arrays, appended in place and memory-mapped by readers; meta.json holds the row count
+FEATURES_FILE = 'features.f32'
+LABELS_FILE = 'labels.i8'
+GAMES_FILE = 'games.i32'
+META_FILE = 'meta.json'
+
+
+class FeatureCache:
+    """Training matrix (features, labels, game_pk) on disk, keyed by feature version and the loaded dates."""
+
+    def __init__(self, directory=FEATURE_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_FILE)) as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            return None
+        # Matrices built by other feature code are useless; start over
+        return meta if meta.get('feature_version') == FEATURE_VERSION else None
+
+    def _write_meta(self, meta):
+        # Written last and swapped in by rename, so a crash mid-append leaves the old row count in force
+        staging = self._path(f'{META_FILE}.tmp')
+        with open(staging, 'w') as file:
+            json.dump(meta, file)
+        os.replace(staging, self._path(META_FILE))
+
+    @property
+    def key(self):
+        # Identifies the matrix currently on disk: feature code version, the watermark of its last full build,
+        # the current ingestion watermark and the row count
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        return f"{meta['feature_version']}:{meta.get('built_through')}:{meta.get('watermark')}:{meta['rows']}"
+
+    def load(self):
+        # (X, y, game_pk) as read-only memory maps, or None when there is no usable cache
+        meta = self._read_meta()
+        if meta is None or meta['rows'] == 0:
+            return None
+        rows = meta['rows']
+        X = np.memmap(self._path(FEATURES_FILE), dtype=np.float32, mode='r', shape=(rows, len(FEATURE_COLUMNS)))
+        y = np.memmap(self._path(LABELS_FILE), dtype=np.int8, mode='r', shape=(rows,))
+        game_pk = np.memmap(self._path(GAMES_FILE), dtype=np.int32, mode='r', shape=(rows,))
+        return X, y, game_pk
+
+    def _append(self, meta, features):
+        rows = meta['rows']
+        for name, values, itemsize in [(FEATURES_FILE, features[FEATURE_COLUMNS].to_numpy(np.float32),
+                                        4 * len(FEATURE_COLUMNS)),
+                                       (LABELS_FILE, features['winning_team'].to_numpy(np.int8), 1),
+                                       (GAMES_FILE, features['game_pk'].to_numpy(np.int32), 4)]:
+            with open(self._path(name), 'ab') as file:
+                # Drop anything past the committed row count left by an interrupted append
+                file.truncate(rows * itemsize)
+                file.write(np.ascontiguousarray(values).tobytes())
+        meta['rows'] = rows + len(features)
+
+    def refresh(self, engine, batch_size=50000, rebuild=False):
+        # Builds the matrix on first use (or when asked to rebuild) and afterwards appends only the rows of newly
+        # loaded dates, whose matchup features use partial aggregates (see the module docstring)
+        ensure_game_results(engine)
+        loaded_dates = get_loaded_dates(engine)
+        meta = None if rebuild else self._read_meta()
+
+        if meta is None:
+            print("Building the feature cache...")
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory)
+            meta = {'feature_version': FEATURE_VERSION, 'rows': 0, 'dates': []}
+            pending_dates, start_date = None, None
+        else:
+            pending_dates = loaded_dates - set(meta['dates'])
+            if not pending_dates:
+                return self.load()
+            print(f"Appending {len(pending_dates)} newly loaded dates to the feature cache...")
+            start_date = min(pending_dates)
+
+        labels = load_game_labels(engine)
+        for df in iter_statcast_chunks(engine, batch_size=batch_size, start_date=start_date):
+            if pending_dates is not None:
+                # Backfilled dates can sit among dates already cached; keep only the new ones
+                df = df[pd.to_datetime(df['game_date']).dt.strftime('%Y-%m-%d').isin(pending_dates)]
+                if df.empty:
+                    continue
+            self._append(meta, build_features(df, labels=labels))
+
+        meta['dates'] = sorted(loaded_dates | set(meta['dates']))
+        meta['watermark'] = meta['dates'][-1] if meta['dates'] else None
+        if pending_dates is None:
+            meta['built_through'] = meta['watermark']
+        self._write_meta(meta)
+        print(f"Feature cache holds {meta['rows']} rows up to {meta['watermark']} "
+              f"(last fully built through {meta.get('built_through')})")
+        return self.load()
+
+
+feature_cache = FeatureCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or extend the on-disk training feature matrix")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="rebuild from scratch instead of appending newly loaded dates")
+    parser.add_argument('--batch-size', type=int, default=50000, help="statcast rows per chunk")
+    args = parser.parse_args()
+
+    feature_cache.refresh(get_engine(), batch_size=args.batch_size, rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from modules.prediction.preprocessor import FEATURE_COLUMNS
+
+# sklearn marks leaves with -1 children
+TREE_LEAF = -1
+# From sklearn 1.4 trees store class fractions and predict_proba returns them as is; before, they stored weighted
+# counts and predict_proba normalized them
+VALUES_ARE_FRACTIONS = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) >= (1, 4)
+
+
+class FlatForest:
+    """A fitted RandomForestClassifier flattened into contiguous node arrays and scored with NumPy.
+
+    predict_proba returns exactly what sklearn's does (single-threaded, so trees are summed in order) without its
+    per-call validation, joblib dispatch and per-tree Python loop.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, leaf_proba, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+
+    @classmethod
+    def from_model(cls, model):
+        # All trees' nodes in one set of arrays; child indices are shifted by each tree's offset. Leaves point to
+        # themselves, which is how apply tells them apart.
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        n_classes = int(np.atleast_1d(model.n_classes_)[0])
+        feature, threshold, left, right, missing_left, leaf_proba = [], [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == TREE_LEAF
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            missing_left.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)))
+            # Leaf class fractions, computed the way this sklearn's DecisionTreeClassifier.predict_proba does
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            if not VALUES_ARE_FRACTIONS:
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba = proba / normalizer
+            leaf_proba.append(proba)
+
+        return cls(np.concatenate(feature).astype(np.intp), np.concatenate(threshold).astype(np.float64),
+                   np.concatenate(left).astype(np.intp), np.concatenate(right).astype(np.intp),
+                   np.concatenate(missing_left).astype(bool), np.concatenate(leaf_proba),
+                   offsets[:-1].astype(np.intp), max(tree.max_depth for tree in trees), np.asarray(model.classes_))
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        # Leaf of every (row, tree), walking the ones not yet at a leaf down one level per step. Inputs are compared
+        # as float32, like sklearn's trees do, and missing values follow each node's learned direction.
+        X = np.asarray(X, dtype=np.float32)
+        values = X.ravel()
+        nodes = np.tile(self.roots, len(X))
+        row_offsets = np.repeat(np.arange(len(X)) * X.shape[1], self.n_estimators)
+        walking = np.flatnonzero(self.left[nodes] != nodes)
+        while len(walking):
+            current = nodes[walking]
+            value = values[row_offsets[walking] + self.feature[current]]
+            go_left = np.where(np.isnan(value), self.missing_left[current], value <= self.threshold[current])
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[walking] = current
+            walking = walking[self.left[current] != current]
+        return nodes.reshape(len(X), self.n_estimators)
+
+    def predict_proba(self, X, chunk_size=4096):
+        # Per-tree probabilities summed in tree order (cumsum adds sequentially, like sklearn's accumulation)
+        # and then averaged, so the result matches sklearn bit for bit. Rows go in chunks to bound the
+        # (rows, trees) working arrays.
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((len(X), self.leaf_proba.shape[1]))
+        for start in range(0, len(X), chunk_size):
+            leaf_proba = self.leaf_proba[self.apply(X[start:start + chunk_size])]
+            proba[start:start + chunk_size] = np.cumsum(leaf_proba, axis=1)[:, -1] / self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        arrays = {name: getattr(self, name) for name in ('feature', 'threshold', 'left', 'right', 'missing_left',
+                                                         'leaf_proba', 'roots', 'classes_')}
+        with open(f'{path}.tmp', 'wb') as file:
+            np.savez(file, max_depth=self.max_depth, **arrays)
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            return cls(archive['feature'], archive['threshold'], archive['left'], archive['right'],
+                       archive['missing_left'], archive['leaf_proba'], archive['roots'], archive['max_depth'],
+                       archive['classes_'])
+
+
+def assert_equivalent(model, forest, X):
+    # Raises unless the flattened forest reproduces sklearn's probabilities exactly. sklearn is run
+    # single-threaded: with threads its trees are summed in completion order, which is not reproducible itself.
+    n_jobs = model.n_jobs
+    model.set_params(n_jobs=1)
+    try:
+        expected = model.predict_proba(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    finally:
+        model.set_params(n_jobs=n_jobs)
+    actual = forest.predict_proba(X)
+    if not np.array_equal(expected, actual):
+        mismatches = np.argwhere(expected != actual)
+        raise AssertionError(f"{len(mismatches)} probabilities differ from sklearn, first at row {mismatches[0][0]}: "
+                             f"{actual[mismatches[0][0]]} vs {expected[mismatches[0][0]]}")
+
+
+def validation_rows(forest, n_rows=10000, random_state=42):
+    # Random rows, plus rows sitting exactly on (and one float32 step either side of) a sample of split
+    # thresholds, so comparisons are also exercised at their boundaries
+    rng = np.random.default_rng(random_state)
+    X = rng.random((n_rows, len(FEATURE_COLUMNS))) * np.array([1, 1, 4, 1])
+    splits = np.flatnonzero(forest.left != np.arange(len(forest.left)))
+    splits = rng.choice(splits, min(n_rows, len(splits)), replace=False)
+    thresholds = forest.threshold[splits].astype(np.float32)
+    boundary = []
+    above, below = np.nextafter(thresholds, np.float32(np.inf)), np.nextafter(thresholds, np.float32(-np.inf))
+    for value in (thresholds, above, below):
+        rows = X[rng.integers(0, n_rows, len(splits))]
+        rows[np.arange(len(splits)), forest.feature[splits]] = value
+        boundary.append(rows)
+    return np.vstack([X, *boundary])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flatten a trained forest into NumPy node arrays and validate it")
+    parser.add_argument('model', nargs='?', default=os.path.join(os.path.dirname(__file__), 'trained_model.joblib'),
+                        help="joblib model artifact")
+    parser.add_argument('--output', help="where to write the node arrays, defaults to <model>.forest.npz")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    forest = FlatForest.from_model(model)
+    output = args.output or f'{args.model}.forest.npz'
+    forest.save(output)
+    print(f"Wrote {forest.n_estimators} trees, {len(forest.feature)} nodes (max depth {forest.max_depth}) to {output}")
+
+    X = validation_rows(forest)
+    assert_equivalent(model, FlatForest.load(output), X)
+    print(f"Validated bit-for-bit against sklearn on {len(X)} rows")
+
+    row = pd.DataFrame(X[:1], columns=FEATURE_COLUMNS)
+    for label, predict in [('sklearn', model.predict_proba), ('flattened', forest.predict_proba)]:
+        start = time.perf_counter()
+        for _ in range(200):
+            predict(row)
+        print(f"{label}: {(time.perf_counter() - start) / 200 * 1000:.2f} ms per single-row predict_proba")
+
+
+if __name__ == "__main__":
+    main()
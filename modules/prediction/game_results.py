@@ -0,0 +1,99 @@
+import pandas as pd
+from sqlalchemy import text
+
+from modules.prediction.database import has_table
+
+# One row per game with its final score. Scores only ever go up during a game, so the final score is the
+# maximum post-pitch score, which does not depend on how the game's rows are ordered or chunked.
+CREATE_GAME_RESULTS = """
+CREATE TABLE IF NOT EXISTS game_results (
+    game_pk INTEGER PRIMARY KEY,
+    game_date TEXT NOT NULL,
+    home_team TEXT,
+    away_team TEXT,
+    home_score INTEGER NOT NULL,
+    away_score INTEGER NOT NULL,
+    home_win INTEGER NOT NULL
+)
+"""
+
+CREATE_GAME_RESULTS_DATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_game_results_date ON game_results (game_date)"
+
+# A suspended game is loaded over two dates; keep its first date and the higher score of each load
+UPSERT_GAME_RESULTS = """
+INSERT INTO game_results (game_pk, game_date, home_team, away_team, home_score, away_score, home_win)
+VALUES (:game_pk, :game_date, :home_team, :away_team, :home_score, :away_score, :home_win)
+ON CONFLICT (game_pk) DO UPDATE SET
+    game_date = MIN(game_date, excluded.game_date),
+    home_score = MAX(home_score, excluded.home_score),
+    away_score = MAX(away_score, excluded.away_score),
+    home_win = MAX(home_score, excluded.home_score) > MAX(away_score, excluded.away_score)
+"""
+
+
+def build_game_results(conn):
+    # Rebuild the whole table from statcast_data in a single aggregate pass
+    conn.execute(text("DROP TABLE IF EXISTS game_results"))
+    conn.execute(text(CREATE_GAME_RESULTS))
+    conn.execute(text("""
+        INSERT INTO game_results (game_pk, game_date, home_team, away_team, home_score, away_score, home_win)
+        SELECT game_pk, MIN(substr(game_date, 1, 10)), MIN(home_team), MIN(away_team),
+               COALESCE(MAX(post_home_score), 0), COALESCE(MAX(post_away_score), 0),
+               COALESCE(MAX(post_home_score), 0) > COALESCE(MAX(post_away_score), 0)
+        FROM statcast_data
+        WHERE game_pk IS NOT NULL
+        GROUP BY game_pk
+    """))
+    conn.execute(text(CREATE_GAME_RESULTS_DATE_INDEX))
+
+
+def ensure_game_results(engine):
+    # Build the table on first use so existing databases pick it up without a separate step
+    with engine.begin() as conn:
+        if not has_table(conn, 'game_results'):
+            print("Building game_results from statcast_data...")
+            build_game_results(conn)
+
+
+def aggregate_games(df):
+    df = df[df['game_pk'].notna()]
+    games = df.groupby('game_pk', as_index=False, observed=True).agg(
+        game_date=('game_date', 'min'),
+        home_team=('home_team', 'first'),
+        away_team=('away_team', 'first'),
+        home_score=('post_home_score', 'max'),
+        away_score=('post_away_score', 'max'),
+    )
+    games['game_date'] = pd.to_datetime(games['game_date']).dt.strftime('%Y-%m-%d')
+    games[['home_score', 'away_score']] = games[['home_score', 'away_score']].fillna(0).astype(int)
+    games['home_win'] = (games['home_score'] > games['away_score']).astype(int)
+    games['game_pk'] = games['game_pk'].astype(int)
+    return games
+
+
+def update_game_results(conn, df):
+    # Fold a batch of statcast rows, already appended to statcast_data on this connection, into the per-game
+    # results. A missing table is built from all of statcast_data instead, like update_matchup_stats does.
+    if df.empty:
+        return
+    if not has_table(conn, 'game_results'):
+        print("Building game_results from statcast_data...")
+        build_game_results(conn)
+        return
+    conn.execute(text(UPSERT_GAME_RESULTS), aggregate_games(df).to_dict('records'))
+
+
+def load_game_labels(engine, start_date=None, end_date=None):
+    # home_win indexed by game_pk; a season is a few thousand rows, so callers load it once and look up per row
+    conditions, params = [], {}
+    if start_date is not None:
+        conditions.append("game_date >= :start_date")
+        params['start_date'] = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+    if end_date is not None:
+        conditions.append("game_date <= :end_date")
+        params['end_date'] = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+    query = text(f"SELECT game_pk, home_win FROM game_results "
+                 f"{'WHERE ' + ' AND '.join(conditions) if conditions else ''}")
+    with engine.connect() as conn:
+        labels = pd.read_sql_query(query, conn, params=params, index_col='game_pk')
+    return labels['home_win'].astype('int8')
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import pandas as pd
+
+HTTP_CACHE_DB = os.getenv('HTTP_CACHE_DB', 'http_cache.db')
+
+# (URL pattern, seconds a response is served without asking the server again). Once stale, an entry
+# is revalidated with If-None-Match/If-Modified-Since, so an unchanged payload costs a 304.
+DEFAULT_TTLS = [
+    (r'/schedule\b', 60),
+    (r'/game/\d+/boxscore\b', 60),
+    (r'^pybaseball:schedule_and_record\b', 12 * 60 * 60),
+]
+DEFAULT_TTL = 300
+
+
+class CachedResponse:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """SQLite-backed cache for outbound HTTP responses and other slow calls, evicting least recently used."""
+
+    def __init__(self, path=HTTP_CACHE_DB, ttls=DEFAULT_TTLS, default_ttl=DEFAULT_TTL, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                self._initialize(conn)
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self, conn):
+        # The database is created on first use, not at import time
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    key TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._initialized = True
+
+    def ttl_for(self, key):
+        for pattern, ttl in self.ttls:
+            if pattern.search(key):
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def key_for(url, params=None):
+        return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+    def _lookup(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT status, body, etag, last_modified, expires_at FROM http_cache WHERE key = ?",
+                               (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE http_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def _store(self, key, status, body, etag=None, last_modified=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (key, status, body, etag, last_modified, now + self.ttl_for(key), now, len(body)))
+            # Drop the least recently used entries beyond the size budget
+            conn.execute("""
+                DELETE FROM http_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running_size
+                        FROM http_cache
+                    ) WHERE running_size > ?
+                )
+            """, (self.max_bytes,))
+
+    def _extend(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE http_cache SET expires_at = ?, last_access = ? WHERE key = ?",
+                         (now + self.ttl_for(key), now, key))
+
+    def get(self, session, url, params=None, timeout=None):
+        key = self.key_for(url, params)
+        entry = self._lookup(key)
+        if entry is not None and entry[4] > time.time():
+            return CachedResponse(entry[0], entry[1])
+
+        headers = {}
+        if entry is not None:
+            if entry[2]:
+                headers['If-None-Match'] = entry[2]
+            if entry[3]:
+                headers['If-Modified-Since'] = entry[3]
+
+        response = session.get(url, params=params, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self._extend(key)
+            return CachedResponse(entry[0], entry[1])
+        if response.status_code == 200:
+            self._store(key, 200, response.content, response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'))
+        return response
+
+    def cached_frame(self, key, fn):
+        # For DataFrame results of calls that are not plain HTTP requests (e.g. pybaseball), with no revalidation.
+        # Stored as JSON with its table schema, never pickled: the file is shared with the web process.
+        entry = self._lookup(key)
+        if entry is not None and entry[4] > time.time():
+            try:
+                return pd.read_json(io.StringIO(entry[1].decode()), orient='table')
+            except (UnicodeDecodeError, ValueError):
+                # Written in another format by an older version; fetched again and replaced below
+                pass
+        result = fn()
+        self._store(key, 200, result.to_json(orient='table', date_format='iso').encode())
+        return result
+
+response_cache = ResponseCache()
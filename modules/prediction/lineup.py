@@ -2,9 +2,10 @@ import os
 from datetime import datetime, timedelta
 import pandas as pd
 from pybaseball import schedule_and_record
-import requests
 import numpy as np
 
+from modules.prediction.statsapi import statsapi_client, fetch_lineup_rows, LINEUP_COLUMNS
+
 # Define the cache file location
 cache_file = 'game_schedules.json'
 
@@ -71,51 +72,13 @@ def get_or_update_schedules(year):
     return schedules
 
 
-def fetch_starting_lineups(date):
-    url = f"https://statsapi.mlb.com/api/v1/schedule?sportId=1&date={date}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f"Failed to fetch schedule data: {response.status_code}")
+def fetch_starting_lineups(date, client=statsapi_client):
+    lineup_data = fetch_lineup_rows(date, team_name_to_abbreviation, client)
+    if lineup_data is None:
+        print("Failed to fetch schedule data")
         return None
 
-    schedule_data = response.json()
-    games = schedule_data.get('dates', [])[0].get('games', [])
-
-    lineup_data = []
-    for game in games:
-        game_id = game['gamePk']
-        game_date = game['officialDate']
-
-        lineup_url = f"https://statsapi.mlb.com/api/v1/game/{game_id}/boxscore"
-        lineup_response = requests.get(lineup_url)
-
-        if lineup_response.status_code != 200:
-            print(f"Failed to fetch lineup for game {game_id}: {lineup_response.status_code}")
-            continue
-
-        lineup_info = lineup_response.json()
-
-        for team in ['home', 'away']:
-            team_info = lineup_info['teams'][team]
-            team_name = team_info['team']['name']
-            starting_pitcher_id = team_info['pitchers'][0] if team_info['pitchers'] else None
-            for player in team_info['players'].values():
-                player_position = player.get('position', {}).get('abbreviation', '')
-                # Only include players with a batting order or starting pitchers
-                if 'battingOrder' in player or player['person']['id'] == starting_pitcher_id:
-                    player_info = {
-                        'game_id': game_id,
-                        'game_date': game_date,
-                        'team': team_name,
-                        'team_abbr': team_name_to_abbreviation.get(team_name, None),  # Add abbreviation
-                        'player_id': player['person']['id'],
-                        'player_name': player['person']['fullName'],
-                        'batting_order': player.get('battingOrder', ''),
-                        'position': player_position
-                    }
-                    lineup_data.append(player_info)
-
-    lineups_df = pd.DataFrame(lineup_data)
+    lineups_df = pd.DataFrame(lineup_data, columns=LINEUP_COLUMNS)
     return lineups_df
 
 
@@ -0,0 +1,120 @@
+import threading
+from datetime import datetime, timezone
+
+from ..game_management.schedule_store import schedule_store
+from .cache import prediction_cache, lineup_abbreviation, lineup_fingerprint, NO_LINEUP
+from .lineup import fetch_starting_lineups
+from .statsapi import statsapi_client, schedule_games, LINEUP_HYDRATION
+from .utils import get_game_predictions
+
+
+def first_pitch_times(schedule_data):
+    times = []
+    for game in schedule_games(schedule_data):
+        if game.get('gameDate'):
+            times.append(datetime.fromisoformat(game['gameDate'].replace('Z', '+00:00')))
+    return times
+
+
+def next_poll_interval(first_pitches, now, min_interval=60, max_interval=900):
+    # Lineups post in the hours before first pitch, so poll faster as the next game approaches
+    upcoming = [(first_pitch - now).total_seconds() for first_pitch in first_pitches if first_pitch > now]
+    if not upcoming:
+        return max_interval
+    return min(max_interval, max(min_interval, min(upcoming) / 4))
+
+
+def team_fingerprints(lineups):
+    if lineups is None or lineups.empty:
+        return {}
+    starters = lineups[(lineups['batting_order'] != '') | (lineups['position'] == 'P')]
+    return {team: lineup_fingerprint(starters, [team]) for team in starters['team_abbr'].dropna().unique()}
+
+
+class LineupWatcher:
+    """Polls today's lineups and re-predicts only the games whose confirmed lineup changed."""
+
+    def __init__(self, client=statsapi_client, min_interval=60, max_interval=900):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._snapshot = {}
+        self._day = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def changed_teams(self, fingerprints):
+        teams = set(fingerprints) | set(self._snapshot)
+        return {team for team in teams
+                if fingerprints.get(team, NO_LINEUP) != self._snapshot.get(team, NO_LINEUP)}
+
+    def poll(self):
+        # One pass: fetch lineups, diff them per team and refresh the cached predictions of changed games.
+        # Returns the seconds to wait before the next pass.
+        today = datetime.now().date()
+        if today != self._day:
+            self._snapshot = {}
+            self._day = today
+
+        date = today.strftime("%Y-%m-%d")
+        schedule_data = self.client.schedule(date, hydrate=LINEUP_HYDRATION)
+        if schedule_data is None:
+            return self.min_interval
+        # Same request as fetch_starting_lineups makes, so it is answered by the response cache
+        lineups = fetch_starting_lineups(date, client=self.client)
+        if lineups is None:
+            return self.min_interval
+
+        fingerprints = team_fingerprints(lineups)
+        changed = self.changed_teams(fingerprints)
+        if changed:
+            # Schedules and lineups spell a few teams differently (KCR and KC)
+            game_ids = [game['id'] for game in schedule_store.games_on(today)
+                        if lineup_abbreviation(game['home_team']) in changed
+                        or lineup_abbreviation(game['away_team']) in changed]
+            print(f"Lineups changed for {sorted(changed)}, re-predicting {len(game_ids)} games")
+            # Published first: the results page keys its lookups on the same snapshot
+            prediction_cache.publish_lineups(today, fingerprints)
+            get_game_predictions(game_ids, fingerprints)
+        self._snapshot = fingerprints
+
+        return next_poll_interval(first_pitch_times(schedule_data), datetime.now(timezone.utc),
+                                  self.min_interval, self.max_interval)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                interval = self.poll()
+            except Exception as e:
+                print(f"Lineup poll failed: {e}")
+                interval = self.min_interval
+            self._stop.wait(interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='lineup-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def init_app(self, app):
+        # Each worker process polls on its own; run this module as a sidecar instead when there are many workers
+        if app.config.get('LINEUP_WATCHER'):
+            self.start()
+
+
+lineup_watcher = LineupWatcher()
+
+
+def main():
+    # Sidecar mode: python -m modules.prediction.lineup_watcher (set PREDICTION_CACHE_DB to share results)
+    try:
+        lineup_watcher.run()
+    except KeyboardInterrupt:
+        lineup_watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import text
+
+from modules.prediction.matchup_stats import (STAT_COLUMNS, RATES, DENOMINATOR, PA_RATES, PA_DENOMINATOR,
+                                              load_matchup_stats)
+from modules.prediction.player_embeddings import PlayerEmbeddings, PLAYER_EMBEDDINGS_FILE, lookup
+from modules.prediction.preprocessor import FEATURE_COLUMNS
+
+# Every rate the matrix serves, as name: (numerator stats, denominator): the model features per at-bat row and
+# the simulator's inputs per plate appearance
+RATE_DEFINITIONS = {**{name: (numerator, DENOMINATOR) for name, numerator in RATES},
+                    **{name: (numerator, PA_DENOMINATOR) for name, numerator in PA_RATES}}
+
+# Bases are not binomial, so their prior strengths are borrowed from the matching hit rate
+STRENGTH_SOURCE = {'total_bases': 'batting_average', 'bases_rate': 'hit_rate'}
+
+# Bounds on how many at-bats of evidence a prior is worth
+MIN_PRIOR_STRENGTH = 1.0
+MAX_PRIOR_STRENGTH = 10000.0
+
+
+def prior_strength(successes, trials, prior_mean):
+    # Beta-binomial method of moments. Around the right prior, n * (p - m)^2 averages m(1 - m) from binomial
+    # noise plus n times the real between-player variance, so whatever spread exceeds the noise is signal.
+    seen = trials > 0
+    successes, trials, prior_mean = successes[seen], trials[seen], np.broadcast_to(prior_mean, seen.shape)[seen]
+    if len(trials) < 2:
+        return MAX_PRIOR_STRENGTH
+    noise = prior_mean * (1 - prior_mean)
+    between = (np.sum((successes - trials * prior_mean) ** 2 / trials) - noise.sum()) / trials.sum()
+    if between <= 0:
+        return MAX_PRIOR_STRENGTH
+    return float(np.clip(noise.mean() / between - 1, MIN_PRIOR_STRENGTH, MAX_PRIOR_STRENGTH))
+
+
+def shrink(successes, trials, prior_mean, strength):
+    return (successes + strength * prior_mean) / (trials + strength)
+
+
+def player_totals(player_index, pair_totals, n_players):
+    # Sum of each stat over a player's pairs, plus a trailing zero row for players the matrix has never seen
+    totals = np.zeros((n_players + 1, pair_totals.shape[1]))
+    for column in range(pair_totals.shape[1]):
+        totals[:n_players, column] = np.bincount(player_index, weights=pair_totals[:, column], minlength=n_players)
+    return totals
+
+
+class MatchupMatrix:
+    """Pitcher x batter totals from matchup_stats in one sparse matrix, with shrunk rates for any pair."""
+
+    def __init__(self, stats, embeddings=None):
+        self.embeddings = embeddings
+        self.pitcher_ids = np.unique(stats['pitcher'].to_numpy(np.int64))
+        self.batter_ids = np.unique(stats['batter'].to_numpy(np.int64))
+        pitcher_index = np.searchsorted(self.pitcher_ids, stats['pitcher'].to_numpy(np.int64))
+        batter_index = np.searchsorted(self.batter_ids, stats['batter'].to_numpy(np.int64))
+
+        # The matrix holds each pair's 1-based row in `totals`, so a single sparse gather fetches every stat
+        # of a pair; row 0 is all zeros and is what absent pairs read
+        self.totals = np.vstack([np.zeros((1, len(STAT_COLUMNS))), stats[STAT_COLUMNS].to_numpy(np.float64)])
+        self.positions = sparse.csr_matrix(
+            (np.arange(1, len(stats) + 1), (pitcher_index, batter_index)),
+            shape=(len(self.pitcher_ids), len(self.batter_ids)))
+
+        pair_totals = self.totals[1:]
+        self.pitcher_totals = player_totals(pitcher_index, pair_totals, len(self.pitcher_ids))
+        self.batter_totals = player_totals(batter_index, pair_totals, len(self.batter_ids))
+
+        # Player rates are pulled toward the league rate and combined into each pair's prior; pairs are pulled
+        # toward that prior. Each strength is fitted once, here, from all pairs and players.
+        self.league_rates, self.pitcher_rates, self.batter_rates, self.strengths = {}, {}, {}, {}
+        for name, (numerator, denominator) in RATE_DEFINITIONS.items():
+            pair_successes = self._numerator(pair_totals, numerator)
+            pair_trials = pair_totals[:, self._column(denominator)]
+            league = pair_successes.sum() / pair_trials.sum() if pair_trials.sum() > 0 else 0.0
+            self.league_rates[name] = league
+            for role, totals, rates in (('pitcher', self.pitcher_totals, self.pitcher_rates),
+                                        ('batter', self.batter_totals, self.batter_rates)):
+                successes, trials = self._numerator(totals, numerator), totals[:, self._column(denominator)]
+                self.strengths[(name, role)] = self._strength(name, role, successes, trials, league)
+                rates[name] = shrink(successes, trials, league, self.strengths[(name, role)])
+            prior = self._pair_prior(name, pitcher_index, batter_index)
+            self.strengths[(name, 'pair')] = self._strength(name, 'pair', pair_successes, pair_trials, prior)
+
+    def _strength(self, name, role, successes, trials, prior_mean):
+        if name in STRENGTH_SOURCE:
+            return self.strengths[(STRENGTH_SOURCE[name], role)]
+        return prior_strength(successes, trials, prior_mean)
+
+    @staticmethod
+    def _column(stat):
+        return STAT_COLUMNS.index(stat)
+
+    @classmethod
+    def _numerator(cls, totals, stats):
+        return totals[:, [cls._column(stat) for stat in stats]].sum(axis=1)
+
+    @classmethod
+    def load(cls, engine, embeddings_path=PLAYER_EMBEDDINGS_FILE):
+        return cls(load_matchup_stats(engine), embeddings=PlayerEmbeddings.load(embeddings_path))
+
+    def _pair_prior(self, name, pitcher_index, batter_index):
+        # log5 for a pair: batter rate times the pitcher's rate relative to the league
+        league = self.league_rates[name]
+        if league == 0:
+            return np.zeros(len(pitcher_index))
+        return self.batter_rates[name][batter_index] * self.pitcher_rates[name][pitcher_index] / league
+
+    def pair_totals(self, pitcher_ids, batter_ids):
+        # STAT_COLUMNS totals for each requested pair, zeros for pairs without history
+        pitcher_index = lookup(pitcher_ids, self.pitcher_ids)
+        batter_index = lookup(batter_ids, self.batter_ids)
+        known = (pitcher_index < len(self.pitcher_ids)) & (batter_index < len(self.batter_ids))
+        positions = np.zeros(len(known), dtype=np.int64)
+        if known.any():
+            positions[known] = np.asarray(self.positions[pitcher_index[known], batter_index[known]]).ravel()
+        return self.totals[positions], pitcher_index, batter_index
+
+    def rates(self, pitcher_ids, batter_ids, names):
+        # Shrunk rates of every (pitcher, batter) pair, and which pairs have faced each other before.
+        # Pairs without history get their prior: the player embeddings' prediction when they have been fitted,
+        # otherwise the two players' own rates, or the league rate for unknown players.
+        totals, pitcher_index, batter_index = self.pair_totals(pitcher_ids, batter_ids)
+        rates = {}
+        for name in names:
+            numerator, denominator = RATE_DEFINITIONS[name]
+            if self.embeddings is not None and name in self.embeddings.means:
+                prior = np.maximum(self.embeddings.score(name, pitcher_ids, batter_ids), 0)
+            else:
+                prior = self._pair_prior(name, pitcher_index, batter_index)
+            rates[name] = shrink(self._numerator(totals, numerator), totals[:, self._column(denominator)], prior,
+                                 self.strengths[(name, 'pair')])
+        return rates, totals[:, self._column(DENOMINATOR)] > 0
+
+    def features(self, pitcher_ids, batter_ids, is_home):
+        # Model features for every pair, and which pairs have history
+        features, found = self.rates(pitcher_ids, batter_ids, [name for name, _ in RATES])
+        features['is_home'] = np.asarray(is_home)
+        return pd.DataFrame(features, columns=FEATURE_COLUMNS), found
+
+    def plate_appearance_rates(self, pitcher_ids, batter_ids):
+        # walk_rate, hit_rate and bases_rate per plate appearance for every pair
+        return self.rates(pitcher_ids, batter_ids, [name for name, _ in PA_RATES])[0]
+
+
+class MatchupMatrixCache:
+    """Process-wide MatchupMatrix, rebuilt when matchup_stats or the player embeddings change."""
+
+    def __init__(self, check_interval=60, embeddings_path=PLAYER_EMBEDDINGS_FILE):
+        self.check_interval = check_interval
+        self.embeddings_path = embeddings_path
+        self._lock = threading.Lock()
+        self._last_check = None
+        self._current = (None, None)
+
+    def _version(self, engine):
+        with engine.connect() as conn:
+            stats_version = tuple(conn.execute(text("SELECT COUNT(*), TOTAL(at_bats) FROM matchup_stats")).fetchone())
+        embeddings_version = os.stat(self.embeddings_path).st_mtime_ns if os.path.exists(self.embeddings_path) else None
+        return stats_version + (embeddings_version,)
+
+    def get(self, engine):
+        if self._current[0] is not None and time.monotonic() - self._last_check < self.check_interval:
+            return self._current[0]
+
+        with self._lock:
+            if self._current[0] is None or time.monotonic() - self._last_check >= self.check_interval:
+                self._last_check = time.monotonic()
+                version = self._version(engine)
+                if version != self._current[1]:
+                    print(f"Loading the matchup matrix ({version[0]} pairs)...")
+                    self._current = (MatchupMatrix.load(engine, self.embeddings_path), version)
+
+        return self._current[0]
+
+
+matchup_matrix_cache = MatchupMatrixCache()
@@ -1,66 +1,70 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
-from sklearn.model_selection import train_test_split
-from preprocessor import preprocess_data, engineer_features, print_dataframe_info
+from modules.prediction.preprocessor import print_dataframe_info, FEATURE_COLUMNS
 from datetime import datetime
-import requests
-import joblib
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from lineup import get_lineups_for_teams, team_name_to_abbreviation
-
-MODEL_CACHE_FILE = 'trained_model.joblib'
-DATABASE_FILE = 'baseball_data.db'
+from modules.prediction.lineup import get_lineups_for_teams, team_name_to_abbreviation
+from modules.prediction.database import get_engine
+from modules.prediction.feature_cache import feature_cache
+from modules.prediction.matchup_matrix import matchup_matrix_cache
+from modules.prediction.matchup_stats import ensure_matchup_stats
+from modules.prediction.sampling import ReservoirSampler
+from modules.prediction.registry import model_registry
+from modules.prediction.statsapi import statsapi_client, schedule_games
 
 
 def batch_preprocess(engine, batch_size=50000):
-    offset = 0
-    while True:
-        query = f"SELECT * FROM statcast_data LIMIT {batch_size} OFFSET {offset}"
-        df = pd.read_sql(query, engine)
-
-        if df.empty:
-            break
-
-        preprocessed_df = preprocess_data(df)
-        engineered_df = engineer_features(preprocessed_df)
-
-        X = engineered_df[['batting_average', 'on_base_percentage', 'total_bases', 'is_home']]
-        y = engineered_df['winning_team']
-
-        yield X, y
-
-        offset += batch_size
+    # Slices of the on-disk feature matrix; statcast rows are only preprocessed for newly loaded dates
+    cached = feature_cache.refresh(engine, batch_size=batch_size)
+    if cached is None:
+        return
+    X, y, _ = cached
+    for start in range(0, len(y), batch_size):
+        yield pd.DataFrame(X[start:start + batch_size], columns=FEATURE_COLUMNS), y[start:start + batch_size]
 
 
-def train_model():
-    if os.path.exists(MODEL_CACHE_FILE):
-        print("Loading cached model...")
-        return joblib.load(MODEL_CACHE_FILE)
+def train_model(trees_per_chunk=5, holdout_size=20000, batch_size=50000):
+    model, version = model_registry.get()
+    if model is not None:
+        print(f"Using cached model {version}")
+        return model
 
-    engine = create_engine(f'sqlite:///{DATABASE_FILE}')
+    engine = get_engine()
 
+    # Out-of-core training: a warm-started forest grows trees_per_chunk new trees on each chunk, so
+    # memory is bounded by one chunk plus the hold-out reservoir and every chunk contributes to the model.
     print("Training the model in batches...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+    model = RandomForestClassifier(n_estimators=0, warm_start=True, random_state=42, n_jobs=-1)
+    holdout = ReservoirSampler(holdout_size, random_state=42)
+    classes = None
+
+    for i, (X_batch, y_batch) in enumerate(batch_preprocess(engine, batch_size=batch_size)):
+        train_mask = holdout.offer(X_batch, y_batch)
+        X_train, y_train = X_batch[train_mask], y_batch[train_mask]
+
+        # Trees from different chunks are averaged, so every chunk must carry the same label set
+        batch_classes = np.unique(y_train)
+        if classes is None:
+            classes = batch_classes
+        if len(y_train) == 0 or not np.array_equal(batch_classes, classes):
+            print(f"Skipping batch {i + 1}: labels {batch_classes} do not match {classes}")
+            continue
 
-    X_test, y_test = None, None
+        model.n_estimators += trees_per_chunk
+        model.fit(X_train, y_train)
 
-    for i, (X_batch, y_batch) in enumerate(batch_preprocess(engine)):
-        if i == 0:
-            X_train, X_test, y_train, y_test = train_test_split(X_batch, y_batch, test_size=0.2, random_state=42)
-            model.fit(X_train, y_train)
-        else:
-            model.fit(X_batch, y_batch)
+        print(f"Processed batch {i + 1} ({model.n_estimators} trees)")
 
-        print(f"Processed batch {i + 1}")
+    if model.n_estimators == 0:
+        print("Not enough data to train the model.")
+        return None
 
-    if X_test is not None and y_test is not None:
-        print("Evaluating the model...")
-        y_pred = model.predict(X_test)
+    X_test, y_test = holdout.sample()
+    if X_test is not None and len(y_test) > 0:
+        print(f"Evaluating the model on {len(y_test)} held-out rows...")
+        y_pred = model.predict(pd.DataFrame(X_test, columns=FEATURE_COLUMNS))
         accuracy = accuracy_score(y_test, y_pred)
         print(f"Model Accuracy: {accuracy}")
         print(classification_report(y_test, y_pred))
@@ -68,25 +72,14 @@ def train_model():
         print("Not enough data to evaluate the model.")
 
     print("Caching the trained model...")
-    joblib.dump(model, MODEL_CACHE_FILE)
+    model_registry.publish(model)
 
     return model
 
 
 def predict_matchup(model, pitcher_id, batter_id, is_home, engine):
-    query = "SELECT * FROM statcast_data WHERE pitcher = ? AND batter = ?"
-    df = pd.read_sql(query, engine, params=(pitcher_id, batter_id))
-
-    if df.empty:
-        return 0.5
-
-    preprocessed_df = preprocess_data(df)
-    engineered_df = engineer_features(preprocessed_df)
-
-    batting_average = engineered_df['batting_average'].mean()
-    on_base_percentage = engineered_df['on_base_percentage'].mean()
-    total_bases = engineered_df['total_bases'].sum()
-    input_data = [[batting_average, on_base_percentage, total_bases, is_home]]
+    # Shrunk matchup rates, so pairs that never met are scored from the two players' overall rates
+    input_data, _ = matchup_matrix_cache.get(engine).features([pitcher_id], [batter_id], [is_home])
 
     try:
         probabilities = model.predict_proba(input_data)[0]
@@ -96,41 +89,54 @@ def predict_matchup(model, pitcher_id, batter_id, is_home, engine):
         return 0.5
 
 
-def predict_game(model, home_lineup, away_lineup, engine):
-    home_pitcher = home_lineup[0]
-    away_pitcher = away_lineup[0]
+def positive_class_proba(probabilities):
+    # The cached model can be single-class; fall back to its only column like predict_matchup does
+    return probabilities[:, 1] if probabilities.shape[1] == 2 else probabilities[:, 0]
+
+
+def slate_matchups(lineups):
+    # Every (game, pitcher, batter, is_home) triple for a list of (home_lineup, away_lineup) pairs,
+    # each lineup starting with its pitcher
+    game_index, pitchers, batters, is_home = [], [], [], []
+    for i, (home_lineup, away_lineup) in enumerate(lineups):
+        for pitcher, lineup, home_flag in ((home_lineup[0], away_lineup[1:], 1), (away_lineup[0], home_lineup[1:], 0)):
+            game_index.extend([i] * len(lineup))
+            pitchers.extend([pitcher] * len(lineup))
+            batters.extend(lineup)
+            is_home.extend([home_flag] * len(lineup))
+
+    return (np.array(game_index, dtype=np.int64), np.array(pitchers, dtype=np.int64),
+            np.array(batters, dtype=np.int64), np.array(is_home, dtype=np.int8))
+
 
-    matchups = [(home_pitcher, batter, 1) for batter in away_lineup[1:]] + \
-               [(away_pitcher, batter, 0) for batter in home_lineup[1:]]
+def predict_slate(model, lineups, engine):
+    # Home win probability for every game in the slate: one sparse gather and one predict_proba call
+    game_index, pitchers, batters, is_home = slate_matchups(lineups)
+    probabilities = np.full(len(game_index), 0.5)
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_matchup = {
-            executor.submit(predict_matchup, model, pitcher, batter, is_home, engine): (pitcher, batter, is_home)
-            for pitcher, batter, is_home in matchups}
+    if len(game_index) > 0:
+        features, _ = matchup_matrix_cache.get(engine).features(pitchers, batters, is_home)
+        probabilities = positive_class_proba(model.predict_proba(features))
 
-        results = []
-        for future in as_completed(future_to_matchup):
-            matchup = future_to_matchup[future]
-            try:
-                result = future.result()
-                results.append((matchup, result))
-            except Exception as exc:
-                print(f'{matchup} generated an exception: {exc}')
+    # Same reduction predict_game always used: mean over matchups, flipping those with the home pitcher
+    home_probabilities = np.where(is_home == 1, 1 - probabilities, probabilities)
+    counts = np.bincount(game_index, minlength=len(lineups))
+    totals = np.bincount(game_index, weights=home_probabilities, minlength=len(lineups))
+    return np.divide(totals, counts, out=np.full(len(lineups), 0.5), where=counts > 0)
 
-    home_win_probability = sum(1 - result if matchup[2] == 1 else result for matchup, result in results)
-    return home_win_probability / len(results) if results else 0.5
+
+def predict_game(model, home_lineup, away_lineup, engine):
+    return predict_slate(model, [(home_lineup, away_lineup)], engine)[0]
 
 
 def get_today_games():
     today = datetime.now().strftime("%Y-%m-%d")
-    url = f"https://statsapi.mlb.com/api/v1/schedule?sportId=1&date={today}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f"Failed to fetch today's games: {response.status_code}")
+    schedule_data = statsapi_client.schedule(today)
+    if schedule_data is None:
+        print("Failed to fetch today's games")
         return None
 
-    schedule_data = response.json()
-    games = schedule_data.get('dates', [])[0].get('games', [])
+    games = schedule_games(schedule_data)
 
     return [{'home_team': team_name_to_abbreviation.get(game['teams']['home']['team']['name'],
                                                         game['teams']['home']['team']['name']),
@@ -154,9 +160,9 @@ def main():
 
     print(f"\nPredicting {len(today_games)} games for today:")
 
-    engine = create_engine(f'sqlite:///{DATABASE_FILE}')
+    ensure_matchup_stats(get_engine())
 
-    all_predictions = []
+    slate_games, slate_lineups = [], []
     for game in today_games:
         home_team, away_team = game['home_team'], game['away_team']
         home_lineup = lineups[lineups['team_abbr'] == home_team]['player_id'].tolist()
@@ -166,9 +172,14 @@ def main():
             print(f"\nMissing lineup data for {away_team} @ {home_team}. Skipping.")
             continue
 
-        print(f"\nAnalyzing matchup: {away_team} @ {home_team}")
+        slate_games.append(game)
+        slate_lineups.append((home_lineup, away_lineup))
 
-        home_win_prob = predict_game(model, home_lineup, away_lineup, engine)
+    home_win_probs = predict_slate(model, slate_lineups, get_engine(read_only=True))
+
+    all_predictions = []
+    for game, home_win_prob in zip(slate_games, home_win_probs):
+        home_team, away_team = game['home_team'], game['away_team']
 
         all_predictions.append({
             'home_team': home_team,
@@ -176,11 +187,11 @@ def main():
             'home_win_prob': home_win_prob
         })
 
-        print(f"Prediction for {away_team} @ {home_team}")
+        print(f"\nPrediction for {away_team} @ {home_team}")
         print(f"Home team ({home_team}) win probability: {home_win_prob:.2f}")
         print(f"Away team ({away_team}) win probability: {1 - home_win_prob:.2f}")
 
-    print("\nNote: A win probability of 0.50 indicates no historical data for that matchup.")
+    print("\nNote: Matchups without history are scored from each player's overall rates.")
 
     print("\n===== Summary of Today's Predictions =====")
     for pred in all_predictions:
@@ -0,0 +1,113 @@
+import pandas as pd
+from sqlalchemy import text
+
+from modules.prediction.database import has_table
+from modules.prediction.preprocessor import HIT_EVENTS, TOTAL_BASES
+
+# Materialized pitcher-batter aggregates. `at_bats` counts statcast rows, which is the
+# denominator preprocess_data has always used, so the features match what the model was trained on.
+CREATE_MATCHUP_STATS = """
+CREATE TABLE IF NOT EXISTS matchup_stats (
+    pitcher INTEGER NOT NULL,
+    batter INTEGER NOT NULL,
+    at_bats INTEGER NOT NULL,
+    plate_appearances INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    walks INTEGER NOT NULL,
+    total_bases INTEGER NOT NULL,
+    PRIMARY KEY (pitcher, batter)
+) WITHOUT ROWID
+"""
+
+UPSERT_MATCHUP_STATS = """
+INSERT INTO matchup_stats (pitcher, batter, at_bats, plate_appearances, hits, walks, total_bases)
+VALUES (:pitcher, :batter, :at_bats, :plate_appearances, :hits, :walks, :total_bases)
+ON CONFLICT (pitcher, batter) DO UPDATE SET
+    at_bats = at_bats + excluded.at_bats,
+    plate_appearances = plate_appearances + excluded.plate_appearances,
+    hits = hits + excluded.hits,
+    walks = walks + excluded.walks,
+    total_bases = total_bases + excluded.total_bases
+"""
+
+STAT_COLUMNS = ['at_bats', 'plate_appearances', 'hits', 'walks', 'total_bases']
+
+# Model features as rates over at_bats: (name, numerator stats), as MatchupMatrix.features serves them. These are
+# the definitions preprocess_data uses, except total_bases, which is per at-bat here because build_features gives
+# the model one row per pitch
+RATES = [('batting_average', ['hits']),
+         ('on_base_percentage', ['hits', 'walks']),
+         ('total_bases', ['total_bases'])]
+DENOMINATOR = 'at_bats'
+
+# Rates per plate appearance for simulating games; plate_appearances counts the pitches that ended one
+PA_RATES = [('walk_rate', ['walks']),
+            ('hit_rate', ['hits']),
+            ('bases_rate', ['total_bases'])]
+PA_DENOMINATOR = 'plate_appearances'
+
+
+def _sql_list(values):
+    return ', '.join(f"'{value}'" for value in values)
+
+
+def build_matchup_stats(conn):
+    # Rebuild the whole table from statcast_data in a single aggregate pass. TOTAL rather than SUM: a pair whose
+    # every row has NULL events (e.g. pitching changes mid plate appearance) sums to 0, not NULL.
+    bases_case = ' '.join(f"WHEN '{event}' THEN {bases}" for event, bases in TOTAL_BASES.items())
+    conn.execute(text("DROP TABLE IF EXISTS matchup_stats"))
+    conn.execute(text(CREATE_MATCHUP_STATS))
+    conn.execute(text(f"""
+        INSERT INTO matchup_stats (pitcher, batter, at_bats, plate_appearances, hits, walks, total_bases)
+        SELECT pitcher, batter,
+               COUNT(*),
+               COUNT(events),
+               TOTAL(events IN ({_sql_list(HIT_EVENTS)})),
+               TOTAL(events = 'walk'),
+               TOTAL(CASE events {bases_case} ELSE 0 END)
+        FROM statcast_data
+        GROUP BY pitcher, batter
+    """))
+
+
+def ensure_matchup_stats(engine):
+    # Build the table on first use so existing databases pick it up without a separate step
+    with engine.begin() as conn:
+        if not has_table(conn, 'matchup_stats'):
+            print("Building matchup_stats from statcast_data...")
+            build_matchup_stats(conn)
+
+
+def aggregate_matchups(df):
+    events = df['events']
+    stats = pd.DataFrame({
+        'pitcher': df['pitcher'],
+        'batter': df['batter'],
+        'at_bats': 1,
+        'plate_appearances': events.notna().astype(int),
+        'hits': events.isin(HIT_EVENTS).astype(int),
+        'walks': (events == 'walk').astype(int),
+        'total_bases': events.map(TOTAL_BASES).fillna(0).astype(int),
+    })
+    return stats.groupby(['pitcher', 'batter'], as_index=False)[STAT_COLUMNS].sum()
+
+
+def update_matchup_stats(conn, df):
+    # Fold a batch of statcast rows, already appended to statcast_data on this connection, into the aggregates.
+    # Without the table yet (an existing database's first incremental load) it is built from all of
+    # statcast_data, which includes the batch.
+    if df.empty:
+        return
+    if not has_table(conn, 'matchup_stats'):
+        print("Building matchup_stats from statcast_data...")
+        build_matchup_stats(conn)
+        return
+    stats = aggregate_matchups(df)
+    conn.execute(text(UPSERT_MATCHUP_STATS), stats.astype(int).to_dict('records'))
+
+
+def load_matchup_stats(engine):
+    # The whole table; one row per pitcher-batter pair that has met
+    with engine.connect() as conn:
+        return pd.read_sql_query(text(f"SELECT pitcher, batter, {', '.join(STAT_COLUMNS)} FROM matchup_stats"), conn)
+
@@ -1,90 +1,62 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
-from preprocessor import preprocess_data, engineer_features, print_dataframe_info
+from modules.prediction.preprocessor import print_dataframe_info, FEATURE_COLUMNS
 from datetime import datetime
 import requests
 import joblib
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from lineup import get_lineups_for_teams, team_name_to_abbreviation
+from modules.prediction.lineup import get_lineups_for_teams, team_name_to_abbreviation
+from modules.prediction.database import get_engine
+from modules.prediction.feature_cache import feature_cache
+from modules.prediction.matchup_matrix import matchup_matrix_cache
+from modules.prediction.matchup_stats import ensure_matchup_stats
+from modules.prediction.tuning import successive_halving_search, holdout_mask, TUNING_RESULTS_FILE
 
 MODEL_CACHE_FILE = 'trained_model.joblib'
-DATABASE_FILE = 'baseball_data.db'
 
-def batch_preprocess(engine, batch_size=50000):
-    offset = 0
-    while True:
-        query = f"SELECT * FROM statcast_data LIMIT {batch_size} OFFSET {offset}"
-        df = pd.read_sql(query, engine)
-
-        if df.empty:
-            break
-
-        preprocessed_df = preprocess_data(df)
-        engineered_df = engineer_features(preprocessed_df)
-
-        X = engineered_df[['batting_average', 'on_base_percentage', 'total_bases', 'is_home']]
-        y = engineered_df['winning_team']
-
-        yield X, y
-
-        offset += batch_size
-
-def train_model():
+def train_model(n_candidates=None, n_jobs=-1):
     if os.path.exists(MODEL_CACHE_FILE):
         print("Loading cached model...")
         return joblib.load(MODEL_CACHE_FILE)
 
-    engine = create_engine(f'sqlite:///{DATABASE_FILE}')
+    engine = get_engine()
 
-    print("Training the model in batches...")
-    model = RandomForestClassifier(random_state=42, n_jobs=-1)
-
-    X_test, y_test = None, None
-    all_X_train, all_y_train = pd.DataFrame(), pd.Series()
-
-    for i, (X_batch, y_batch) in enumerate(batch_preprocess(engine)):
-        if i == 0:
-            X_train, X_test, y_train, y_test = train_test_split(X_batch, y_batch, test_size=0.2, random_state=42)
-            all_X_train = X_train
-            all_y_train = y_train
-        else:
-            all_X_train = pd.concat([all_X_train, X_batch])
-            all_y_train = pd.concat([all_y_train, y_batch])
-
-        print(f"Processed batch {i + 1}")
+    # The training matrix is built once (and only extended afterwards) by the feature cache, then
+    # memory-mapped by every search worker
+    cached = feature_cache.refresh(engine)
+    if cached is None:
+        print("Not enough data to train the model.")
+        return None
+    X, y, game_pk = cached
 
-    print("Performing cross-validation...")
-    cv_scores = cross_val_score(model, all_X_train, all_y_train, cv=5, scoring='accuracy')
-    print(f"Cross-validation accuracy: {cv_scores.mean():.4f}")
+    # Fits already scored for this exact matrix are read back instead of rerun, so an interrupted search resumes
+    print("Tuning hyperparameters with successive halving...")
+    best_params, cv_score = successive_halving_search(
+        X, y, game_pk, os.path.join(feature_cache.directory, TUNING_RESULTS_FILE), feature_cache.key,
+        n_candidates=n_candidates, n_jobs=n_jobs)
+    print(f"Best parameters found: {best_params} (cross-validation accuracy {cv_score:.4f})")
 
-    print("Tuning hyperparameters with GridSearchCV...")
-    param_grid = {
-        'n_estimators': [100, 200, 300],
-        'max_depth': [None, 10, 20, 30],
-        'min_samples_split': [2, 5, 10]
-    }
-    grid_search = GridSearchCV(estimator=model, param_grid=param_grid, cv=5, scoring='accuracy')
-    grid_search.fit(all_X_train, all_y_train)
-    model = grid_search.best_estimator_
-    print(f"Best parameters found: {grid_search.best_params_}")
+    # Whole games are held out for the final evaluation; the search never saw them
+    test_mask = holdout_mask(game_pk)
+    X_train = pd.DataFrame(X[~test_mask], columns=FEATURE_COLUMNS)
+    X_test = pd.DataFrame(X[test_mask], columns=FEATURE_COLUMNS)
+    y_train, y_test = y[~test_mask], y[test_mask]
 
     print("Training the model with the best parameters...")
-    model.fit(all_X_train, all_y_train)
+    model = RandomForestClassifier(random_state=42, n_jobs=-1, **best_params)
+    model.fit(X_train, y_train)
 
-    if X_test is not None and y_test is not None:
+    if len(y_test) > 0:
         print("Evaluating the model on the test set...")
         y_pred = model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
-        roc_auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
-
         print(f"Test Accuracy: {accuracy:.4f}")
-        print(f"ROC AUC Score: {roc_auc:.4f}")
+        if len(model.classes_) == 2 and len(np.unique(y_test)) == 2:
+            roc_auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+            print(f"ROC AUC Score: {roc_auc:.4f}")
         print(classification_report(y_test, y_pred))
     else:
         print("Not enough data to evaluate the model.")
@@ -94,24 +66,15 @@ def train_model():
 
     return model
 
-def predict_matchup(model, pitcher_id, batter_id, is_home, engine):
-    query = "SELECT * FROM statcast_data WHERE pitcher = ? AND batter = ?"
-    df = pd.read_sql(query, engine, params=(pitcher_id, batter_id))
-
-    if df.empty:
-        return 0.5
+def positive_class_proba(probabilities):
+    return probabilities[:, 1] if probabilities.shape[1] == 2 else probabilities[:, 0]
 
-    preprocessed_df = preprocess_data(df)
-    engineered_df = engineer_features(preprocessed_df)
-
-    batting_average = engineered_df['batting_average'].mean()
-    on_base_percentage = engineered_df['on_base_percentage'].mean()
-    total_bases = engineered_df['total_bases'].sum()
-    input_data = [[batting_average, on_base_percentage, total_bases, is_home]]
+def predict_matchup(model, pitcher_id, batter_id, is_home, engine):
+    # Shrunk matchup rates from the in-memory matrix; pairs that never met get the players' overall rates
+    input_data, _ = matchup_matrix_cache.get(engine).features([pitcher_id], [batter_id], [is_home])
 
     try:
-        probabilities = model.predict_proba(input_data)[0]
-        return probabilities[1] if len(probabilities) == 2 else probabilities[0]
+        return positive_class_proba(model.predict_proba(input_data))[0]
     except Exception as e:
         print(f"Error in predict_matchup: {e}")
         return 0.5
@@ -122,23 +85,20 @@ def predict_game(model, home_lineup, away_lineup, engine):
 
     matchups = [(home_pitcher, batter, 1) for batter in away_lineup[1:]] + \
                [(away_pitcher, batter, 0) for batter in home_lineup[1:]]
+    if not matchups:
+        return 0.5
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_matchup = {
-            executor.submit(predict_matchup, model, pitcher, batter, is_home, engine): (pitcher, batter, is_home)
-            for pitcher, batter, is_home in matchups}
-
-        results = []
-        for future in as_completed(future_to_matchup):
-            matchup = future_to_matchup[future]
-            try:
-                result = future.result()
-                results.append((matchup, result))
-            except Exception as exc:
-                print(f'{matchup} generated an exception: {exc}')
+    # Every matchup of the game from one sparse gather, scored in one predict_proba call
+    pitchers, batters, is_home = (np.array(column) for column in zip(*matchups))
+    features, _ = matchup_matrix_cache.get(engine).features(pitchers, batters, is_home)
+    try:
+        results = positive_class_proba(model.predict_proba(features))
+    except Exception as e:
+        print(f"Error in predict_game: {e}")
+        return 0.5
 
-    home_win_probability = sum(1 - result if matchup[2] == 1 else result for matchup, result in results)
-    return home_win_probability / len(results) if results else 0.5
+    home_win_probability = np.where(is_home == 1, 1 - results, results)
+    return home_win_probability.mean()
 
 def get_today_games():
     today = datetime.now().strftime("%Y-%m-%d")
@@ -172,7 +132,8 @@ def main():
 
     print(f"\nPredicting {len(today_games)} games for today:")
 
-    engine = create_engine(f'sqlite:///{DATABASE_FILE}')
+    ensure_matchup_stats(get_engine())
+    engine = get_engine(read_only=True)
 
     all_predictions = []
     for game in today_games:
@@ -198,7 +159,7 @@ def main():
         print(f"Home team ({home_team}) win probability: {home_win_prob:.2f}")
         print(f"Away team ({away_team}) win probability: {1 - home_win_prob:.2f}")
 
-    print("\nNote: A win probability of 0.50 indicates no historical data for that matchup.")
+    print("\nNote: Matchups without history are scored from each player's overall rates.")
 
     print("\n===== Summary of Today's Predictions =====")
     for pred in all_predictions:
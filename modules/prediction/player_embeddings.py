@@ -0,0 +1,175 @@
+import argparse
+import os
+
+import numpy as np
+from scipy import sparse
+
+from modules.prediction.database import get_engine
+from modules.prediction.matchup_stats import RATES, DENOMINATOR, ensure_matchup_stats, load_matchup_stats
+
+PLAYER_EMBEDDINGS_FILE = os.getenv('PLAYER_EMBEDDINGS_FILE', 'player_embeddings.npz')
+
+RANK = 8
+# Ridge penalty on each player's factors and bias, in at-bats: a player with far fewer at-bats stays near the mean
+REGULARIZATION = 100.0
+ITERATIONS = 15
+# Refits after a day of new data start from the previous factors, which are already close
+WARM_START_ITERATIONS = 3
+
+
+def lookup(ids, known_ids):
+    # Position of each id in the sorted known_ids, or len(known_ids) (a trailing default row) when it is not there
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(known_ids) == 0:
+        return np.zeros(len(ids), dtype=np.int64)
+    index = np.minimum(np.searchsorted(known_ids, ids), len(known_ids) - 1)
+    return np.where(known_ids[index] == ids, index, len(known_ids))
+
+
+def solve_side(index, n_players, features, targets, weights, regularization, chunk_size=65536):
+    # Weighted ridge regression for every player at once. Each player's normal equations are sums over their
+    # pairs, taken as one sparse (players x pairs) product per chunk of pairs, and all of them are solved as a batch.
+    n_pairs, d = features.shape
+    members = sparse.csc_matrix((weights, (index, np.arange(n_pairs))), shape=(n_players, n_pairs))
+    lhs = np.zeros((n_players, d * d))
+    for start in range(0, n_pairs, chunk_size):
+        chunk = features[start:start + chunk_size]
+        lhs += members[:, start:start + chunk_size] @ (chunk[:, :, None] * chunk[:, None, :]).reshape(len(chunk), -1)
+    rhs = members @ (features * targets[:, None])
+    lhs = lhs.reshape(n_players, d, d) + regularization * np.eye(d)
+    return np.linalg.solve(lhs, rhs[..., None])[..., 0]
+
+
+def with_ones(factors):
+    return np.hstack([factors, np.ones((len(factors), 1))])
+
+
+class PlayerEmbeddings:
+    """Low-rank pitcher and batter factors per rate, as float32 arrays indexed by player id.
+
+    A pair's rate is mean + u_p . v_b + pitcher bias + batter bias. The stored rows are [u, bias, 1] for
+    pitchers and [v, 1, bias] for batters, so the whole prediction is one dot product per pair.
+    """
+
+    def __init__(self, pitcher_ids, batter_ids, means, pitcher_factors, batter_factors):
+        self.pitcher_ids = pitcher_ids
+        self.batter_ids = batter_ids
+        self.means = means
+        self.pitcher_factors = pitcher_factors
+        self.batter_factors = batter_factors
+
+    @property
+    def rank(self):
+        return next(iter(self.pitcher_factors.values())).shape[1] - 2
+
+    def score(self, name, pitcher_ids, batter_ids):
+        # Players without factors read the trailing row, which keeps only the other player's bias
+        pitchers = self.pitcher_factors[name][lookup(pitcher_ids, self.pitcher_ids)]
+        batters = self.batter_factors[name][lookup(batter_ids, self.batter_ids)]
+        return self.means[name] + np.einsum('ij,ij->i', pitchers, batters, dtype=np.float64)
+
+    def _previous_factors(self, name, role, ids):
+        # (known mask, factors, biases) of the given players in this fit; unknown players read the trailing row
+        known_ids, stored = ((self.pitcher_ids, self.pitcher_factors[name]) if role == 'pitcher'
+                             else (self.batter_ids, self.batter_factors[name]))
+        index = lookup(ids, known_ids)
+        bias_column = self.rank if role == 'pitcher' else self.rank + 1
+        return index < len(known_ids), stored[index, :self.rank], stored[index, bias_column]
+
+    @classmethod
+    def fit(cls, stats, rank=RANK, iterations=ITERATIONS, regularization=REGULARIZATION, warm_start=None,
+            random_state=42):
+        # Alternating least squares on each rate of the pitcher x batter matrix, weighted by at-bats
+        stats = stats[stats[DENOMINATOR] > 0]
+        pitcher_ids = np.unique(stats['pitcher'].to_numpy(np.int64))
+        batter_ids = np.unique(stats['batter'].to_numpy(np.int64))
+        pitcher_index = lookup(stats['pitcher'], pitcher_ids)
+        batter_index = lookup(stats['batter'], batter_ids)
+        weights = stats[DENOMINATOR].to_numpy(np.float64)
+        if warm_start is not None and warm_start.rank != rank:
+            warm_start = None
+
+        rng = np.random.default_rng(random_state)
+        means, pitcher_factors, batter_factors = {}, {}, {}
+        for name, numerator in RATES:
+            successes = stats[numerator].sum(axis=1).to_numpy(np.float64)
+            rates = successes / weights
+            mean = successes.sum() / weights.sum() if len(weights) else 0.0
+
+            u = rng.normal(scale=0.01, size=(len(pitcher_ids), rank))
+            v = rng.normal(scale=0.01, size=(len(batter_ids), rank))
+            pitcher_bias, batter_bias = np.zeros(len(pitcher_ids)), np.zeros(len(batter_ids))
+            if warm_start is not None:
+                for role, ids, factors, biases in (('pitcher', pitcher_ids, u, pitcher_bias),
+                                                   ('batter', batter_ids, v, batter_bias)):
+                    known, previous, previous_bias = warm_start._previous_factors(name, role, ids)
+                    factors[known], biases[known] = previous[known], previous_bias[known]
+
+            for _ in range(iterations):
+                solved = solve_side(pitcher_index, len(pitcher_ids), with_ones(v[batter_index]),
+                                    rates - mean - batter_bias[batter_index], weights, regularization)
+                u, pitcher_bias = solved[:, :rank], solved[:, rank]
+                solved = solve_side(batter_index, len(batter_ids), with_ones(u[pitcher_index]),
+                                    rates - mean - pitcher_bias[pitcher_index], weights, regularization)
+                v, batter_bias = solved[:, :rank], solved[:, rank]
+
+            # Trailing rows for unknown players: [0, 0, 1] and [0, 1, 0] keep the known player's bias
+            unknown_pitcher, unknown_batter = np.zeros(rank + 2), np.zeros(rank + 2)
+            unknown_pitcher[rank + 1], unknown_batter[rank] = 1, 1
+            means[name] = mean
+            pitcher_factors[name] = np.vstack([np.column_stack([u, pitcher_bias, np.ones(len(u))]),
+                                               unknown_pitcher]).astype(np.float32)
+            batter_factors[name] = np.vstack([np.column_stack([v, np.ones(len(v)), batter_bias]),
+                                              unknown_batter]).astype(np.float32)
+
+        return cls(pitcher_ids, batter_ids, means, pitcher_factors, batter_factors)
+
+    def save(self, path=PLAYER_EMBEDDINGS_FILE):
+        # Written to a temporary file and renamed, so readers never load half an archive
+        arrays = {'pitcher_ids': self.pitcher_ids, 'batter_ids': self.batter_ids}
+        for name in self.means:
+            arrays[f'mean.{name}'] = np.float64(self.means[name])
+            arrays[f'pitcher_factors.{name}'] = self.pitcher_factors[name]
+            arrays[f'batter_factors.{name}'] = self.batter_factors[name]
+        with open(f'{path}.tmp', 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path=PLAYER_EMBEDDINGS_FILE):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as archive:
+            names = [key.split('.', 1)[1] for key in archive.files if key.startswith('mean.')]
+            return cls(archive['pitcher_ids'], archive['batter_ids'],
+                       {name: float(archive[f'mean.{name}']) for name in names},
+                       {name: archive[f'pitcher_factors.{name}'] for name in names},
+                       {name: archive[f'batter_factors.{name}'] for name in names})
+
+
+def refit_embeddings(engine, path=PLAYER_EMBEDDINGS_FILE, full=False):
+    # Warm-starts from the saved factors unless there are none or a full refit is asked for
+    previous = None if full else PlayerEmbeddings.load(path)
+    stats = load_matchup_stats(engine)
+    iterations = ITERATIONS if previous is None else WARM_START_ITERATIONS
+    print(f"Fitting player embeddings on {len(stats)} matchups "
+          f"({'warm start, ' if previous is not None else ''}{iterations} iterations)...")
+    embeddings = PlayerEmbeddings.fit(stats, iterations=iterations, warm_start=previous)
+    embeddings.save(path)
+    return embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit pitcher and batter embeddings from matchup_stats")
+    parser.add_argument('--full', action='store_true', help="refit from scratch instead of warm-starting")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    ensure_matchup_stats(engine)
+    embeddings = refit_embeddings(engine, full=args.full)
+    print(f"Saved {len(embeddings.pitcher_ids)} pitchers and {len(embeddings.batter_ids)} batters "
+          f"to {PLAYER_EMBEDDINGS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
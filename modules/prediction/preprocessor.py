@@ -1,15 +1,26 @@
 import pandas as pd
 import numpy as np
 
+# Columns of statcast_data that the preprocessing pipeline reads
+RELEVANT_COLUMNS = ['game_date', 'game_pk', 'pitcher', 'batter', 'events', 'home_team', 'away_team',
+                    'post_home_score', 'post_away_score']
+
+# Model inputs, in the order the classifier was trained on
+FEATURE_COLUMNS = ['batting_average', 'on_base_percentage', 'total_bases', 'is_home']
+
+# Bump whenever build_features changes what it computes, so cached feature matrices are rebuilt
+FEATURE_VERSION = 1
+
+HIT_EVENTS = ['single', 'double', 'triple', 'home_run']
+TOTAL_BASES = {'single': 1, 'double': 2, 'triple': 3, 'home_run': 4}
+
 
 def preprocess_data(df):
     # Create a copy of the dataframe to avoid SettingWithCopyWarning
     df = df.copy()
 
     # Filter and select relevant columns
-    relevant_columns = ['game_date', 'game_pk', 'pitcher', 'batter', 'events', 'home_team', 'away_team',
-                        'post_home_score', 'post_away_score']
-    df = df[relevant_columns]
+    df = df[RELEVANT_COLUMNS]
 
     # Check if 'events' column exists
     if 'events' not in df.columns:
@@ -18,7 +29,7 @@ def preprocess_data(df):
         df['is_walk'] = 0
     else:
         # Create binary flags for hits and walks
-        df['is_hit'] = df['events'].isin(['single', 'double', 'triple', 'home_run']).astype(int)
+        df['is_hit'] = df['events'].isin(HIT_EVENTS).astype(int)
         df['is_walk'] = (df['events'] == 'walk').astype(int)
 
     # Aggregate data for pitcher-batter matchups
@@ -45,8 +56,9 @@ def preprocess_data(df):
     df['pitcher_team'] = np.where(df['pitcher'] == df['home_team'], df['home_team'], df['away_team'])
     df['is_home'] = (df['pitcher_team'] == df['home_team']).astype(int)
 
-    # Fill NaN values with 0
-    df.fillna(0, inplace=True)
+    # Fill NaN values with 0 (categorical columns from the compact reader keep their missing values)
+    fill_columns = [column for column, dtype in df.dtypes.items() if not isinstance(dtype, pd.CategoricalDtype)]
+    df[fill_columns] = df[fill_columns].fillna(0)
 
     return df
 
@@ -62,11 +74,87 @@ def engineer_features(df):
     else:
         # Create a feature for total bases
         df['total_bases'] = df['is_hit'] * (
-            df['events'].map({'single': 1, 'double': 2, 'triple': 3, 'home_run': 4}).fillna(0))
+            df['events'].map(TOTAL_BASES).fillna(0))
 
     return df
 
 
+def downcast_statcast(df):
+    # int32 ids, int16 scores and categorical text columns; columns already in their compact dtype are
+    # passed through without a copy
+    compact = {}
+    for column in RELEVANT_COLUMNS:
+        series = df[column]
+        if column in ('game_pk', 'pitcher', 'batter') and series.notna().all():
+            series = series.astype(np.int32, copy=False)
+        elif column in ('post_home_score', 'post_away_score') and series.notna().all():
+            series = series.astype(np.int16, copy=False)
+        elif column in ('events', 'home_team', 'away_team') and not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+        compact[column] = series
+    return pd.DataFrame(compact, copy=False)
+
+
+def category_lookup(series, values):
+    # Per-row lookup of a per-category table: the table is built over the categories, then indexed by code
+    codes = series.cat.codes.to_numpy()
+    table = np.append(values(series.cat.categories), 0)
+    return table[np.where(codes >= 0, codes, len(table) - 1)]
+
+
+def build_features(df, labels=None):
+    # Model features and labels for a statcast chunk, with the same rows, order and values as
+    # engineer_features(preprocess_data(df)), without copying the input frame or merging.
+    # Returns game_pk, FEATURE_COLUMNS and winning_team.
+    df = downcast_statcast(df)
+    n_rows = len(df)
+
+    events = df['events']
+    is_hit = category_lookup(events, lambda categories: categories.isin(HIT_EVENTS)).astype(np.int32)
+    is_walk = category_lookup(events, lambda categories: categories == 'walk').astype(np.int32)
+    total_bases = category_lookup(events, lambda categories: categories.map(TOTAL_BASES).fillna(0).to_numpy())
+
+    # Matchup stats from one grouping over (pitcher, batter), mapped back to rows by group number
+    # Rows with a missing id belong to no group, like in preprocess_data's groupby
+    matchup_codes = df.groupby(['pitcher', 'batter'], sort=False).ngroup().fillna(-1).to_numpy(np.int64)
+    has_matchup = matchup_codes >= 0
+    n_matchups = matchup_codes.max() + 1 if n_rows else 0
+    matchup_codes = np.where(has_matchup, matchup_codes, 0)
+    at_bats = np.bincount(matchup_codes[has_matchup], minlength=n_matchups)
+    hits = np.bincount(matchup_codes[has_matchup], weights=is_hit[has_matchup], minlength=n_matchups)
+    walks = np.bincount(matchup_codes[has_matchup], weights=is_walk[has_matchup], minlength=n_matchups)
+    divisor = np.maximum(at_bats, 1)
+    batting_average = np.where(has_matchup, (hits / divisor)[matchup_codes], 0)
+    on_base_percentage = np.where(has_matchup, ((hits + walks) / divisor)[matchup_codes], 0)
+
+    # Winner decided once per game, then broadcast to the game's rows. Games found in labels (see
+    # game_results.load_game_labels) take their recorded final result; others fall back to the chunk's
+    # last non-null scores, which is only the final score if the chunk holds the whole game.
+    game_codes, games = pd.factorize(df['game_pk'])
+    final_scores = df[['post_home_score', 'post_away_score']].groupby(game_codes).last().reindex(range(len(games)))
+    home_won = (final_scores['post_home_score'] > final_scores['post_away_score']).to_numpy()
+    if labels is not None:
+        recorded = labels.reindex(games).to_numpy(dtype=np.float64)
+        home_won = np.where(np.isnan(recorded), home_won, recorded == 1)
+    home_won = np.append(home_won, False)
+    winning_team = home_won[np.where(game_codes >= 0, game_codes, len(home_won) - 1)].astype(np.int8)
+
+    # preprocess_data picks the pitcher's team by comparing pitcher ids to team abbreviations, which never
+    # match, so is_home reduces to home_team == away_team
+    teams = pd.concat([df['home_team'], df['away_team']], ignore_index=True).astype(object)
+    team_codes, _ = pd.factorize(teams)
+    is_home = ((team_codes[:n_rows] == team_codes[n_rows:]) & (team_codes[:n_rows] >= 0)).astype(np.int8)
+
+    return pd.DataFrame({
+        'game_pk': df['game_pk'].to_numpy(),
+        'batting_average': batting_average.astype(np.float32),
+        'on_base_percentage': on_base_percentage.astype(np.float32),
+        'total_bases': total_bases.astype(np.float32),
+        'is_home': is_home,
+        'winning_team': winning_team,
+    })
+
+
 def print_dataframe_info(df, name):
     print(f"\n{name} DataFrame Info:")
     print(df.info())
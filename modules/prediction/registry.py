@@ -0,0 +1,103 @@
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+from modules.prediction.flat_forest import FlatForest
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATTERN = 'trained_model*.joblib'
+
+
+class ModelRegistry:
+    """Process-wide holder for the trained model, loaded lazily and swapped when a newer artifact appears."""
+
+    def __init__(self, directory=MODEL_DIR, pattern=MODEL_PATTERN, check_interval=30, keep=3):
+        self.directory = directory
+        self.pattern = pattern
+        self.check_interval = check_interval
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._last_check = None
+        # (model, version) is replaced as one tuple, so readers never see a model paired with the wrong version
+        self._current = (None, None)
+        self._forest = (None, None)
+        # (checked at, version) of the newest artifact on disk, for callers that only need the version
+        self._latest = (None, None)
+
+    def _latest_artifact(self):
+        paths = glob.glob(os.path.join(self.directory, self.pattern))
+        if not paths:
+            return None, None
+        stats = [(os.stat(path).st_mtime_ns, path) for path in paths]
+        mtime_ns, path = max(stats)
+        return path, f"{os.path.basename(path)}@{mtime_ns}"
+
+    def _is_due(self):
+        return self._last_check is None or time.monotonic() - self._last_check >= self.check_interval
+
+    def get(self):
+        if self._current[0] is not None and not self._is_due():
+            return self._current
+
+        with self._lock:
+            if self._current[0] is None or self._is_due():
+                self._last_check = time.monotonic()
+                path, version = self._latest_artifact()
+                if path is not None and version != self._current[1]:
+                    print(f"Loading model {version}...")
+                    # Requests already holding the previous model keep using it until they finish.
+                    self._current = (joblib.load(path), version)
+
+        return self._current
+
+    @property
+    def version(self):
+        # The newest artifact's name and mtime, read without loading the model; rechecked at most once per
+        # check_interval, like get
+        checked_at, version = self._latest
+        if checked_at is None or time.monotonic() - checked_at >= self.check_interval:
+            version = self._latest_artifact()[1]
+            self._latest = (time.monotonic(), version)
+        return version
+
+    def get_forest(self):
+        # The current model flattened into NumPy node arrays, for low-latency scoring of small batches.
+        # Built once per model version; same probabilities as the model's single-threaded predict_proba.
+        model, version = self.get()
+        if model is None:
+            return None
+        if self._forest[1] != version:
+            with self._lock:
+                if self._forest[1] != version:
+                    self._forest = (FlatForest.from_model(model), version)
+        return self._forest[0]
+
+    def publish(self, model):
+        # Microseconds, so two publishes within a second do not overwrite each other
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        path = os.path.join(self.directory, f'trained_model-{version}.joblib')
+        # Write to a temporary name and rename, so a reader never loads a half-written artifact
+        joblib.dump(model, f'{path}.tmp')
+        os.replace(f'{path}.tmp', path)
+
+        versioned = sorted(glob.glob(os.path.join(self.directory, 'trained_model-*.joblib')))
+        for old_path in versioned[:-self.keep]:
+            os.remove(old_path)
+
+        self._last_check = None
+        self._latest = (None, None)
+        return path
+
+    def init_app(self, app):
+        app.extensions['model_registry'] = self
+        # Loading before gunicorn forks (--preload) lets workers share the master's pages copy-on-write. That is
+        # the only sharing there is: sklearn copies tree node arrays when unpickling, so memory-mapping would not help
+        if app.config.get('PRELOAD_MODEL'):
+            self.get_forest()
+
+
+model_registry = ModelRegistry()
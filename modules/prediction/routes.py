@@ -3,14 +3,11 @@
 # from flask import Blueprint, jsonify, request
 # from modules.game_management.utils import get_team_roster
 # from modules.prediction.game_lineup import predict_game_outcome_from_lineup
-# from modules.prediction.matchup_model import train_model
+# from modules.prediction.registry import model_registry
 # from modules.result_display.utils import render_results
 #
 # prediction_bp = Blueprint('prediction', __name__)
 #
-# # Train the model
-# model = train_model()
-#
 # @prediction_bp.route('/predict', methods=['POST'])
 # def predict_game():
 #     data = request.json
@@ -19,6 +16,8 @@
 #     if game_id is None:
 #         return jsonify({'error': 'Missing game_id parameter'}), 400
 #
+#     # The registry loads the model once per worker and picks up newly published versions
+#     model, _ = model_registry.get()
 #     predicted_outcome = predict_game_outcome_from_lineup(game_id, model)
 #
 #     if predicted_outcome is None:
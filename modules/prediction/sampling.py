@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class ReservoirSampler:
+    """Uniform fixed-size sample over a stream of (X, y) chunks (Algorithm R, vectorized per chunk)."""
+
+    def __init__(self, size, random_state=None):
+        self.size = size
+        self.seen = 0
+        self.rng = np.random.default_rng(random_state)
+        self.X = None
+        self.y = None
+
+    def offer(self, X, y):
+        # Returns a mask of the rows that were NOT taken into the reservoir. Rows taken are held out
+        # for good: if a later chunk evicts them they are dropped, never trained on.
+        X = np.asarray(X)
+        y = np.asarray(y)
+        if self.X is None:
+            self.X = np.empty((self.size, X.shape[1]), dtype=X.dtype)
+            self.y = np.empty(self.size, dtype=y.dtype)
+
+        positions = self.seen + np.arange(len(X))
+        slots = np.where(positions < self.size, positions, self.rng.integers(0, positions + 1))
+        accepted = slots < self.size
+
+        # Repeated slots within a chunk resolve last-write-wins, same as the sequential algorithm
+        self.X[slots[accepted]] = X[accepted]
+        self.y[slots[accepted]] = y[accepted]
+        self.seen += len(X)
+
+        return ~accepted
+
+    @property
+    def filled(self):
+        return min(self.seen, self.size)
+
+    def sample(self):
+        if self.X is None:
+            return None, None
+        return self.X[:self.filled], self.y[:self.filled]
@@ -0,0 +1,210 @@
+import time
+
+import numpy as np
+
+from modules.prediction.database import get_engine
+from modules.prediction.lineup import get_lineups_for_teams
+from modules.prediction.matchup_matrix import matchup_matrix_cache
+from modules.prediction.matchup_stats import ensure_matchup_stats
+
+OUTCOMES = ['out', 'walk', 'single', 'double', 'triple', 'home_run']
+OUT, WALK, SINGLE, DOUBLE, TRIPLE, HOME_RUN = range(len(OUTCOMES))
+
+# Share of each hit type among all hits (MLB 2023). Bases per hit of a pair tilt it toward or away from extra bases.
+LEAGUE_HIT_MIX = np.array([0.636, 0.201, 0.017, 0.146])
+HIT_BASES = np.array([1, 2, 3, 4])
+
+INNINGS = 9
+# Tied games past this many innings count as half a win for each side
+MAX_INNINGS = 20
+# Extra innings start with a runner on second
+EXTRA_INNING_BASES = 0b010
+
+
+def base_out_tables():
+    # (next base state, runs scored) for every base state (bit 0 = first, 1 = second, 2 = third) and outcome.
+    # Runners hold on outs and move up only when forced on walks. A single scores runners from second, and a
+    # runner on first stops at third on a double.
+    next_bases = np.zeros((8, len(OUTCOMES)), dtype=np.int8)
+    runs = np.zeros((8, len(OUTCOMES)), dtype=np.int8)
+    for bases in range(8):
+        first, second, third = bases & 1, (bases >> 1) & 1, (bases >> 2) & 1
+        next_bases[bases, OUT] = bases
+        next_bases[bases, WALK] = 1 | (first | second) << 1 | (third | (first & second)) << 2
+        runs[bases, WALK] = first & second & third
+        next_bases[bases, SINGLE] = 1 | first << 1
+        runs[bases, SINGLE] = second + third
+        next_bases[bases, DOUBLE] = 0b010 | first << 2
+        runs[bases, DOUBLE] = second + third
+        next_bases[bases, TRIPLE] = 0b100
+        runs[bases, TRIPLE] = first + second + third
+        next_bases[bases, HOME_RUN] = 0
+        runs[bases, HOME_RUN] = first + second + third + 1
+    return next_bases, runs
+
+
+NEXT_BASES, RUNS_SCORED = base_out_tables()
+OUTS_MADE = np.array([1, 0, 0, 0, 0, 0], dtype=np.int8)
+
+
+def outcome_probabilities(walk_rate, hit_rate, bases_rate):
+    # Per plate appearance distributions over OUTCOMES from shrunk walk, hit and bases rates
+    walk_rate = np.clip(walk_rate, 0, 0.5)
+    hit_rate = np.clip(hit_rate, 0, 0.9 - walk_rate)
+    bases_per_hit = np.divide(bases_rate, hit_rate, out=np.ones_like(hit_rate), where=hit_rate > 0)
+
+    # Scale the extra-base hit shares so the expected bases per hit match the pair's
+    extra_bases = LEAGUE_HIT_MIX[1:] @ (HIT_BASES[1:] - 1)
+    scale = np.clip((bases_per_hit - 1) / extra_bases, 0, 1 / LEAGUE_HIT_MIX[1:].sum())
+    extra_base_hits = hit_rate[:, None] * scale[:, None] * LEAGUE_HIT_MIX[1:]
+    singles = hit_rate - extra_base_hits.sum(axis=1)
+    return np.column_stack([1 - walk_rate - hit_rate, walk_rate, singles, extra_base_hits])
+
+
+def simulate_half_inning(rng, cumulative, games, slots, lineup_sizes, active, bases, deficit=None):
+    # Plays one half inning for every active simulation at once and returns the runs each scored. Each pass of
+    # the loop is one plate appearance across the simulations still batting. slots is advanced in place.
+    # With deficit set (bottom of the ninth and later) the half ends as soon as the batting side takes the lead.
+    runs = np.zeros(len(games), dtype=np.int16)
+    outs = np.zeros(len(games), dtype=np.int8)
+    bases = np.where(active, bases, 0).astype(np.int8)
+    batting = np.flatnonzero(active)
+    while len(batting):
+        draws = rng.random(len(batting))
+        outcome = (draws[:, None] >= cumulative[games[batting], slots[batting]]).sum(axis=1)
+        outcome = np.minimum(outcome, len(OUTCOMES) - 1)
+
+        runs[batting] += RUNS_SCORED[bases[batting], outcome]
+        bases[batting] = NEXT_BASES[bases[batting], outcome]
+        outs[batting] += OUTS_MADE[outcome]
+        slots[batting] = (slots[batting] + 1) % lineup_sizes[games[batting]]
+
+        still_batting = outs[batting] < 3
+        if deficit is not None:
+            still_batting &= runs[batting] <= deficit[batting]
+        batting = batting[still_batting]
+    return runs
+
+
+def simulate_games(home_probabilities, away_probabilities, home_sizes, away_sizes, n_simulations=10000,
+                   random_state=None):
+    # Final scores of n_simulations runs of every game, as (home_runs, away_runs) arrays of shape (games, sims).
+    # *_probabilities are (games, max lineup, len(OUTCOMES)): each batter's outcome distribution against the
+    # opposing starter, in batting order. The starters pitch the whole game.
+    rng = np.random.default_rng(random_state)
+    home_sizes, away_sizes = np.asarray(home_sizes), np.asarray(away_sizes)
+    n_games = len(home_sizes)
+    games = np.repeat(np.arange(n_games), n_simulations)
+    home_cumulative = np.cumsum(home_probabilities, axis=2)
+    away_cumulative = np.cumsum(away_probabilities, axis=2)
+
+    home_runs = np.zeros(len(games), dtype=np.int16)
+    away_runs = np.zeros(len(games), dtype=np.int16)
+    home_slots = np.zeros(len(games), dtype=np.int64)
+    away_slots = np.zeros(len(games), dtype=np.int64)
+    playing = np.ones(len(games), dtype=bool)
+
+    for inning in range(1, MAX_INNINGS + 1):
+        bases = np.int8(EXTRA_INNING_BASES if inning > INNINGS else 0)
+        away_runs += simulate_half_inning(rng, away_cumulative, games, away_slots, away_sizes, playing, bases)
+        # The home side skips its last half when already ahead, and stops batting once it goes ahead
+        final_innings = inning >= INNINGS
+        if final_innings:
+            playing &= home_runs <= away_runs
+        deficit = away_runs - home_runs if final_innings else None
+        home_runs += simulate_half_inning(rng, home_cumulative, games, home_slots, home_sizes, playing, bases,
+                                          deficit=deficit)
+        if final_innings:
+            playing &= home_runs == away_runs
+            if not playing.any():
+                break
+
+    return home_runs.reshape(n_games, n_simulations), away_runs.reshape(n_games, n_simulations)
+
+
+def summarize(home_runs, away_runs):
+    # Win probability, expected runs and run distributions of one game's simulations
+    totals = home_runs.astype(np.int64) + away_runs
+    return {
+        'home_win_prob': float(np.mean(home_runs > away_runs) + 0.5 * np.mean(home_runs == away_runs)),
+        'expected_home_score': float(home_runs.mean()),
+        'expected_away_score': float(away_runs.mean()),
+        'expected_total_runs': float(totals.mean()),
+        # Probability of each final score 0, 1, 2, ...
+        'home_score_distribution': np.bincount(home_runs) / len(home_runs),
+        'away_score_distribution': np.bincount(away_runs) / len(away_runs),
+        'total_runs_distribution': np.bincount(totals) / len(totals),
+    }
+
+
+def lineup_probabilities(matrix, pitchers, lineups):
+    # (games, max lineup, outcomes) distributions of each lineup's batters against the given pitchers, from one
+    # gather over every pair of the slate. Slots past the end of a short lineup are never reached.
+    sizes = np.array([len(lineup) for lineup in lineups], dtype=np.int64)
+    width = max(sizes.max(initial=0), 1)
+    # An empty lineup bats a single slot that always makes an out
+    probabilities = np.zeros((len(lineups), width, len(OUTCOMES)))
+    probabilities[:, :, OUT] = 1
+    if sizes.sum():
+        game_index = np.repeat(np.arange(len(lineups)), sizes)
+        slot_index = np.concatenate([np.arange(size) for size in sizes])
+        rates = matrix.plate_appearance_rates(np.repeat(pitchers, sizes), np.concatenate(lineups))
+        probabilities[game_index, slot_index] = outcome_probabilities(rates['walk_rate'], rates['hit_rate'],
+                                                                      rates['bases_rate'])
+    return probabilities, np.maximum(sizes, 1)
+
+
+def simulate_slate(lineups, engine, n_simulations=10000, random_state=None):
+    # Summaries for every (home_lineup, away_lineup) pair in the slate; each lineup starts with its pitcher,
+    # followed by its batters in batting order, like matchup_model.predict_slate takes them
+    matrix = matchup_matrix_cache.get(engine)
+    home_pitchers = np.array([home[0] for home, _ in lineups], dtype=np.int64)
+    away_pitchers = np.array([away[0] for _, away in lineups], dtype=np.int64)
+    home_probabilities, home_sizes = lineup_probabilities(matrix, away_pitchers,
+                                                          [np.asarray(home[1:], dtype=np.int64) for home, _ in lineups])
+    away_probabilities, away_sizes = lineup_probabilities(matrix, home_pitchers,
+                                                          [np.asarray(away[1:], dtype=np.int64) for _, away in lineups])
+    home_runs, away_runs = simulate_games(home_probabilities, away_probabilities, home_sizes, away_sizes,
+                                          n_simulations=n_simulations, random_state=random_state)
+    return [summarize(home_runs[i], away_runs[i]) for i in range(len(lineups))]
+
+
+def main(n_simulations=10000):
+    # Imported here: matchup_model pulls in training code the simulator does not need
+    from modules.prediction.matchup_model import get_today_games
+
+    today_games = get_today_games()
+    if today_games is None:
+        print("Failed to fetch today's games. Exiting.")
+        return
+
+    all_teams = set([game['home_team'] for game in today_games] + [game['away_team'] for game in today_games])
+    lineups = get_lineups_for_teams(all_teams)
+    if lineups is None:
+        print("Failed to fetch lineups. Exiting.")
+        return
+
+    ensure_matchup_stats(get_engine())
+
+    slate_games, slate_lineups = [], []
+    for game in today_games:
+        home_lineup = lineups[lineups['team_abbr'] == game['home_team']]['player_id'].tolist()
+        away_lineup = lineups[lineups['team_abbr'] == game['away_team']]['player_id'].tolist()
+        if len(home_lineup) < 2 or len(away_lineup) < 2:
+            print(f"\nMissing lineup data for {game['away_team']} @ {game['home_team']}. Skipping.")
+            continue
+        slate_games.append(game)
+        slate_lineups.append((home_lineup, away_lineup))
+
+    start = time.perf_counter()
+    results = simulate_slate(slate_lineups, get_engine(read_only=True), n_simulations=n_simulations)
+    print(f"\nSimulated {len(slate_games)} games x {n_simulations} in {time.perf_counter() - start:.2f}s")
+
+    for game, result in zip(slate_games, results):
+        print(f"{game['away_team']} @ {game['home_team']}: home win {result['home_win_prob']:.2f}, "
+              f"expected score {result['expected_away_score']:.1f}-{result['expected_home_score']:.1f}, "
+              f"total {result['expected_total_runs']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from modules.prediction.database import get_engine
+from modules.prediction.lineup import get_lineups_for_teams
+from modules.prediction.matchup_matrix import matchup_matrix_cache
+from modules.prediction.matchup_model import get_today_games, positive_class_proba, slate_matchups
+from modules.prediction.matchup_stats import ensure_matchup_stats
+from modules.prediction.registry import model_registry
+from modules.prediction.simulator import lineup_probabilities, simulate_games, summarize
+
+
+class SharedArrays:
+    """NumPy arrays copied once into shared memory blocks, which pool workers attach to by name."""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(specs):
+        # (arrays, blocks); the blocks must stay referenced for as long as the arrays are used
+        arrays, blocks = {}, []
+        for name, (block_name, shape, dtype) in specs.items():
+            # Pool workers share the parent's resource tracker, so attaching does not make them owners; the parent
+            # unlinks every block once the slate is done
+            block = shared_memory.SharedMemory(name=block_name)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            blocks.append(block)
+        return arrays, blocks
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def game_seed(seed, key):
+    # Seeded from the game itself rather than its position or worker, so a rerun reproduces every game's
+    # simulations whatever the slate order or number of workers
+    return np.random.SeedSequence([seed, zlib.crc32(key.encode())])
+
+
+# Per-worker state, set once by init_worker
+_worker = {}
+
+
+def init_worker(specs, n_simulations, seed):
+    _worker['arrays'], _worker['blocks'] = SharedArrays.attach(specs)
+    _worker['n_simulations'] = n_simulations
+    _worker['seed'] = seed
+    # Flattened node arrays score a game's few rows without sklearn's per-call overhead; forked workers share
+    # the parent's copy
+    _worker['model'] = model_registry.get_forest()
+
+
+def run_game(index, key):
+    arrays = _worker['arrays']
+    result = {'index': index, 'pid': os.getpid()}
+
+    start = time.perf_counter()
+    home_runs, away_runs = simulate_games(
+        arrays['home_probabilities'][index:index + 1], arrays['away_probabilities'][index:index + 1],
+        arrays['home_sizes'][index:index + 1], arrays['away_sizes'][index:index + 1],
+        n_simulations=_worker['n_simulations'], random_state=game_seed(_worker['seed'], key))
+    result.update(summarize(home_runs[0], away_runs[0]))
+    result['simulation_seconds'] = time.perf_counter() - start
+
+    # The same reduction as matchup_model.predict_slate, over this game's rows of the slate's feature matrix
+    start = time.perf_counter()
+    rows = slice(arrays['offsets'][index], arrays['offsets'][index + 1])
+    result['model_home_win_prob'] = None
+    if _worker['model'] is not None and rows.stop > rows.start:
+        probabilities = positive_class_proba(_worker['model'].predict_proba(arrays['features'][rows]))
+        result['model_home_win_prob'] = float(np.where(arrays['is_home'][rows] == 1, 1 - probabilities,
+                                                       probabilities).mean())
+    result['prediction_seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_slate(lineups, engine, keys=None, n_simulations=10000, seed=0, max_workers=None):
+    # Simulates and predicts every (home_lineup, away_lineup) pair of the slate on a process pool, one task per
+    # game. Features and outcome distributions come from one matrix gather here; workers read them from shared
+    # memory instead of receiving pickled frames.
+    keys = keys if keys is not None else [str(i) for i in range(len(lineups))]
+    matrix = matchup_matrix_cache.get(engine)
+
+    home_probabilities, home_sizes = lineup_probabilities(
+        matrix, np.array([away[0] for _, away in lineups], dtype=np.int64),
+        [np.asarray(home[1:], dtype=np.int64) for home, _ in lineups])
+    away_probabilities, away_sizes = lineup_probabilities(
+        matrix, np.array([home[0] for home, _ in lineups], dtype=np.int64),
+        [np.asarray(away[1:], dtype=np.int64) for _, away in lineups])
+
+    game_index, pitchers, batters, is_home = slate_matchups(lineups)
+    features, _ = matrix.features(pitchers, batters, is_home)
+    arrays = {
+        'home_probabilities': home_probabilities, 'home_sizes': home_sizes,
+        'away_probabilities': away_probabilities, 'away_sizes': away_sizes,
+        'features': features.to_numpy(np.float64), 'is_home': is_home,
+        # Rows of game i are offsets[i]:offsets[i + 1]; slate_matchups emits them game by game
+        'offsets': np.searchsorted(game_index, np.arange(len(lineups) + 1)),
+    }
+
+    # Loaded and flattened before the pool starts, so forked workers inherit it instead of each building their own
+    model_registry.get_forest()
+    with SharedArrays(arrays) as shared, ProcessPoolExecutor(
+            max_workers=max_workers, initializer=init_worker, initargs=(shared.specs, n_simulations, seed)) as pool:
+        return list(pool.map(run_game, range(len(lineups)), keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate and predict today's slate on a process pool")
+    parser.add_argument('--simulations', type=int, default=10000, help="simulations per game")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument('--seed', type=int, default=0, help="base seed; each game's seed also depends on its teams")
+    args = parser.parse_args()
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    today_games = get_today_games()
+    if today_games is None:
+        print("Failed to fetch today's games. Exiting.")
+        return
+
+    all_teams = set([game['home_team'] for game in today_games] + [game['away_team'] for game in today_games])
+    lineups = get_lineups_for_teams(all_teams)
+    if lineups is None:
+        print("Failed to fetch lineups. Exiting.")
+        return
+
+    ensure_matchup_stats(get_engine())
+
+    slate_games, slate_lineups = [], []
+    for game in today_games:
+        home_lineup = lineups[lineups['team_abbr'] == game['home_team']]['player_id'].tolist()
+        away_lineup = lineups[lineups['team_abbr'] == game['away_team']]['player_id'].tolist()
+        if len(home_lineup) < 2 or len(away_lineup) < 2:
+            print(f"\nMissing lineup data for {game['away_team']} @ {game['home_team']}. Skipping.")
+            continue
+        slate_games.append(game)
+        slate_lineups.append((home_lineup, away_lineup))
+
+    keys = [f"{today}:{game['away_team']}@{game['home_team']}" for game in slate_games]
+    start = time.perf_counter()
+    results = run_slate(slate_lineups, get_engine(read_only=True), keys=keys, n_simulations=args.simulations,
+                        seed=args.seed, max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n===== {len(results)} games, {args.simulations} simulations each =====")
+    for game, result in zip(slate_games, results):
+        model_prob = result['model_home_win_prob']
+        print(f"{game['away_team']} @ {game['home_team']}: "
+              f"simulated home win {result['home_win_prob']:.2f}, "
+              f"model {'n/a' if model_prob is None else f'{model_prob:.2f}'}, "
+              f"expected score {result['expected_away_score']:.1f}-{result['expected_home_score']:.1f} "
+              f"[simulation {result['simulation_seconds'] * 1000:.0f} ms, "
+              f"prediction {result['prediction_seconds'] * 1000:.0f} ms, pid {result['pid']}]")
+
+    busy = sum(result['simulation_seconds'] + result['prediction_seconds'] for result in results)
+    print(f"\nWall time {elapsed:.2f}s for {busy:.2f}s of per-game work")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from modules.prediction.preprocessor import RELEVANT_COLUMNS
+from modules.prediction.statcast_store import statcast_store
+
+# Compact dtypes for the columns the preprocessing pipeline reads
+STATCAST_DTYPES = {
+    'game_pk': 'int32',
+    'pitcher': 'int32',
+    'batter': 'int32',
+    'events': 'category',
+    'home_team': 'category',
+    'away_team': 'category',
+    'post_home_score': 'int16',
+    'post_away_score': 'int16',
+}
+
+def compact_dtypes(columns):
+    return {column: dtype for column, dtype in STATCAST_DTYPES.items() if column in columns}
+
+
+def iter_statcast_chunks(engine, batch_size=50000, columns=RELEVANT_COLUMNS, store=statcast_store, start_date=None):
+    # Reads from the Parquet store once it exists, otherwise from statcast_data in SQLite
+    if store is not None and store.exists():
+        dtypes = compact_dtypes(columns)
+        for df in store.iter_chunks(columns=columns, batch_size=batch_size, start_date=start_date):
+            yield df.astype(dtypes)
+    else:
+        yield from iter_sqlite_chunks(engine, batch_size=batch_size, columns=columns, start_date=start_date)
+
+
+def read_statcast(engine, columns=RELEVANT_COLUMNS, start_date=None, end_date=None, pitchers=None, batters=None,
+                  store=statcast_store):
+    # Pitches matching every given filter, in pitch order. Dates are inclusive.
+    dtypes = compact_dtypes(columns)
+    if store is not None and store.exists():
+        return store.read(columns=columns, start_date=start_date, end_date=end_date,
+                          pitchers=pitchers, batters=batters).astype(dtypes)
+
+    conditions, params, bindparams = [], {}, []
+    if start_date is not None:
+        conditions.append("game_date >= :start_date")
+        params['start_date'] = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+    if end_date is not None:
+        # game_date is stored with a time suffix, so compare against the start of the following day
+        conditions.append("game_date < :end_date")
+        params['end_date'] = (pd.Timestamp(end_date) + timedelta(days=1)).strftime('%Y-%m-%d')
+    for column, values in (('pitcher', pitchers), ('batter', batters)):
+        if values is not None:
+            conditions.append(f"{column} IN :{column}s")
+            params[f'{column}s'] = [int(value) for value in values]
+            bindparams.append(bindparam(f'{column}s', expanding=True))
+
+    query = text(f"SELECT {', '.join(columns)} FROM statcast_data "
+                 f"{'WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+                 f"ORDER BY game_date, game_pk, at_bat_number, pitch_number").bindparams(*bindparams)
+    with engine.connect() as conn:
+        return pd.read_sql_query(query, conn, params=params, dtype=dtypes)
+
+
+def iter_sqlite_chunks(engine, batch_size=50000, columns=RELEVANT_COLUMNS, start_date=None):
+    # Keyset pagination over game_pk. Each chunk ends on a game boundary, so a game is never split
+    # across chunks, and rows come back in pitch order so the last row of a game carries its final score.
+    # Read-only: the pitch-order index it paginates on is created by database.migrate.
+
+    # Rows before start_date are skipped; game_date is stored with a time suffix, so compare as a prefix
+    date_filter = "AND game_date >= :start_date" if start_date is not None else ""
+    params = {'start_date': pd.Timestamp(start_date).strftime('%Y-%m-%d')} if start_date is not None else {}
+
+    boundary_query = text(f"SELECT game_pk FROM statcast_data WHERE game_pk > :last_game_pk {date_filter} "
+                          f"ORDER BY game_pk LIMIT 1 OFFSET :offset")
+    chunk_query = text(f"SELECT {', '.join(columns)} FROM statcast_data "
+                       f"WHERE game_pk > :last_game_pk AND game_pk <= :end_game_pk {date_filter} "
+                       f"ORDER BY game_pk, at_bat_number, pitch_number")
+    dtypes = compact_dtypes(columns)
+
+    last_game_pk = -1
+    if start_date is not None:
+        # Start the keyset just before the first game in range instead of scanning every earlier game
+        with engine.connect() as conn:
+            first_game_pk = conn.execute(text(f"SELECT MIN(game_pk) FROM statcast_data WHERE 1 {date_filter}"),
+                                         params).scalar()
+        if first_game_pk is None:
+            return
+        last_game_pk = first_game_pk - 1
+
+    while True:
+        with engine.connect() as conn:
+            end_game_pk = conn.execute(boundary_query, {**params, 'last_game_pk': last_game_pk,
+                                                        'offset': batch_size - 1}).scalar()
+            if end_game_pk is None:
+                # Fewer than batch_size rows remain; read them all
+                end_game_pk = conn.execute(text(f"SELECT MAX(game_pk) FROM statcast_data WHERE 1 {date_filter}"),
+                                           params).scalar()
+            if end_game_pk is None or end_game_pk <= last_game_pk:
+                break
+
+            df = pd.read_sql_query(chunk_query, conn, params={**params, 'last_game_pk': last_game_pk,
+                                                              'end_game_pk': end_game_pk},
+                                   dtype=dtypes)
+
+        yield df
+
+        last_game_pk = end_game_pk
@@ -0,0 +1,169 @@
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from modules.prediction.preprocessor import RELEVANT_COLUMNS
+
+STATCAST_STORE_DIR = os.getenv('STATCAST_STORE_DIR', 'statcast_parquet')
+
+# Directory layout: season=2023/game_date=2023-06-01/part-0.parquet
+PARTITIONING = ds.partitioning(pa.schema([('season', pa.int16()), ('game_date', pa.string())]), flavor='hive')
+
+# Fixed Arrow types for the columns the pipeline filters, sorts and aggregates on, so every day's file
+# agrees on them however pandas inferred that day's frame
+KEY_TYPES = {
+    'game_pk': pa.int32(),
+    'at_bat_number': pa.int16(),
+    'pitch_number': pa.int16(),
+    'pitcher': pa.int32(),
+    'batter': pa.int32(),
+    'events': pa.string(),
+    'home_team': pa.string(),
+    'away_team': pa.string(),
+    'post_home_score': pa.int16(),
+    'post_away_score': pa.int16(),
+}
+
+# Pitch order within a game; the last row of a game carries its final score
+SORT_COLUMNS = ['game_pk', 'at_bat_number', 'pitch_number']
+
+
+def to_arrow(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for column, arrow_type in KEY_TYPES.items():
+        if column in table.column_names:
+            index = table.schema.get_field_index(column)
+            table = table.set_column(index, column, table.column(column).cast(arrow_type))
+    return table
+
+
+def day_table(day_data):
+    # game_date and season live in the directory names, not in the files
+    df = day_data.drop(columns=['game_date', 'season'], errors='ignore')
+    return to_arrow(df.sort_values([column for column in SORT_COLUMNS if column in df.columns], kind='stable'))
+
+
+class StatcastStore:
+    """Statcast pitches as Parquet files partitioned by season and game date."""
+
+    def __init__(self, root=STATCAST_STORE_DIR):
+        self.root = root
+
+    def exists(self):
+        return os.path.isdir(self.root) and any(name.startswith('season=') for name in os.listdir(self.root))
+
+    def partition_dir(self, game_date):
+        game_date = pd.Timestamp(game_date)
+        return os.path.join(self.root, f'season={game_date.year}', f"game_date={game_date.strftime('%Y-%m-%d')}")
+
+    def write_day(self, game_date, day_data):
+        # Replaces the day's partition, so reloading a date is idempotent. The new file is written
+        # next to the old partition and swapped in by rename.
+        target = self.partition_dir(game_date)
+        # Dot-prefixed, so readers skip a staging directory left behind by a crash
+        staging = os.path.join(os.path.dirname(target), f'.{os.path.basename(target)}.{uuid.uuid4().hex}.tmp')
+        os.makedirs(staging)
+        pq.write_table(day_table(day_data), os.path.join(staging, 'part-0.parquet'))
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.rename(staging, target)
+
+    def dataset(self):
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING,
+                          exclude_invalid_files=False, ignore_prefixes=['.', '_'])
+
+    @staticmethod
+    def filter_expression(start_date=None, end_date=None, pitchers=None, batters=None):
+        # Date bounds hit the partition keys and prune whole directories; player ids are checked against
+        # row group statistics before any data is decoded
+        conditions = []
+        if start_date is not None:
+            start_date = pd.Timestamp(start_date)
+            conditions += [ds.field('season') >= start_date.year,
+                           ds.field('game_date') >= start_date.strftime('%Y-%m-%d')]
+        if end_date is not None:
+            end_date = pd.Timestamp(end_date)
+            conditions += [ds.field('season') <= end_date.year,
+                           ds.field('game_date') <= end_date.strftime('%Y-%m-%d')]
+        if pitchers is not None:
+            conditions.append(ds.field('pitcher').isin(list(pitchers)))
+        if batters is not None:
+            conditions.append(ds.field('batter').isin(list(batters)))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def to_pandas(self, table, columns):
+        df = table.to_pandas()
+        if 'game_date' in df.columns:
+            df['game_date'] = pd.to_datetime(df['game_date'], format='%Y-%m-%d')
+        return df[columns]
+
+    def read(self, columns=RELEVANT_COLUMNS, start_date=None, end_date=None, pitchers=None, batters=None):
+        # Only the requested columns of the matching partitions are read, in pitch order
+        dataset = self.dataset()
+        expression = self.filter_expression(start_date, end_date, pitchers, batters)
+        read_columns = list(dict.fromkeys(['game_date', *columns, *SORT_COLUMNS]))
+        table = dataset.to_table(columns=read_columns, filter=expression)
+        table = table.sort_by([('game_date', 'ascending')] + [(column, 'ascending') for column in SORT_COLUMNS])
+        return self.to_pandas(table, columns)
+
+    def iter_chunks(self, columns=RELEVANT_COLUMNS, batch_size=50000, start_date=None, end_date=None):
+        # Whole days are accumulated until a chunk holds at least batch_size rows. A game is played
+        # on a single date, so chunks end on game boundaries like the SQLite reader's.
+        dataset = self.dataset()
+        read_columns = list(dict.fromkeys(['game_date', *columns, *SORT_COLUMNS]))
+        expression = self.filter_expression(start_date, end_date)
+
+        fragments = sorted(dataset.get_fragments(filter=expression), key=lambda fragment: fragment.path)
+        pending, pending_rows = [], 0
+        for fragment in fragments:
+            table = fragment.to_table(schema=dataset.schema, columns=read_columns)
+            pending.append(table)
+            pending_rows += table.num_rows
+            if pending_rows >= batch_size:
+                yield self.to_pandas(pa.concat_tables(pending), columns)
+                pending, pending_rows = [], 0
+        if pending_rows > 0:
+            yield self.to_pandas(pa.concat_tables(pending), columns)
+
+    def export(self, chunks):
+        # One-off copy of existing statcast_data chunks into an empty store
+        if self.exists():
+            print(f"{self.root} already holds statcast partitions; not exporting.")
+            return
+
+        for i, df in enumerate(chunks):
+            game_dates = pd.to_datetime(df['game_date'])
+            table = to_arrow(df.drop(columns=['game_date']))
+            table = table.append_column('season', pa.array(game_dates.dt.year, pa.int16()))
+            table = table.append_column('game_date', pa.array(game_dates.dt.strftime('%Y-%m-%d'), pa.string()))
+            ds.write_dataset(table, self.root, format='parquet', partitioning=PARTITIONING,
+                             basename_template=f'export-{i}-{{i}}.parquet',
+                             existing_data_behavior='overwrite_or_ignore')
+            print(f"Exported chunk {i + 1} ({len(df)} rows)")
+
+
+statcast_store = StatcastStore()
+
+
+def main():
+    # Copy an existing baseball_data.db into the store: python -m modules.prediction.statcast_store
+    from modules.prediction.database import get_engine, migrate
+    from modules.prediction.statcast_reader import iter_sqlite_chunks
+
+    # The reader paginates on migrate's pitch-order index
+    engine = get_engine()
+    migrate(engine)
+    statcast_store.export(iter_sqlite_chunks(engine, batch_size=200000, columns=['*']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from modules.prediction.http_cache import response_cache
+
+STATSAPI_BASE_URL = 'https://statsapi.mlb.com/api/v1'
+
+# (connect, read) timeouts in seconds for every stats API request
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Schedule hydrations that carry probable pitchers and posted lineups for every game of the date
+LINEUP_HYDRATION = 'probablePitcher,lineups'
+
+# Columns of the lineup DataFrames returned by fetch_starting_lineups
+LINEUP_COLUMNS = ['game_id', 'game_date', 'team', 'team_abbr', 'player_id', 'player_name', 'batting_order', 'position']
+
+
+def create_session(pool_size=16, retries=3, backoff_factor=0.5):
+    # Keep-alive connection pool shared by all threads, retrying transient failures with backoff
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class StatsApiClient:
+    def __init__(self, base_url=STATSAPI_BASE_URL, max_workers=8, timeout=DEFAULT_TIMEOUT, session=None, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = session or create_session(pool_size=max_workers)
+
+    def get_json(self, path, params=None):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        try:
+            if self.cache is not None:
+                response = self.cache.get(self.session, url, params=params, timeout=self.timeout)
+            else:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Request to {url} failed: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"Failed to fetch {url}: {response.status_code}")
+            return None
+        return response.json()
+
+    def schedule(self, date, **params):
+        return self.get_json('schedule', params={'sportId': 1, 'date': date, **params})
+
+    def boxscore(self, game_id):
+        return self.get_json(f'game/{game_id}/boxscore')
+
+    def boxscores(self, game_ids):
+        # Fetch boxscores concurrently, at most max_workers requests in flight
+        game_ids = list(game_ids)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(game_ids, executor.map(self.boxscore, game_ids)))
+
+
+def schedule_games(schedule_data):
+    dates = schedule_data.get('dates', []) if schedule_data else []
+    return dates[0].get('games', []) if dates else []
+
+
+def boxscore_lineup_rows(game_id, game_date, lineup_info, team_name_to_abbreviation):
+    # Starting batters and starting pitcher of both teams, one dict per player
+    rows = []
+    for team in ['home', 'away']:
+        team_info = lineup_info['teams'][team]
+        team_name = team_info['team']['name']
+        starting_pitcher_id = team_info['pitchers'][0] if team_info['pitchers'] else None
+        for player in team_info['players'].values():
+            player_position = player.get('position', {}).get('abbreviation', '')
+            # Only include players with a batting order or starting pitchers
+            if 'battingOrder' in player or player['person']['id'] == starting_pitcher_id:
+                rows.append({
+                    'game_id': game_id,
+                    'game_date': game_date,
+                    'team': team_name,
+                    'team_abbr': team_name_to_abbreviation.get(team_name, None),
+                    'player_id': player['person']['id'],
+                    'player_name': player['person']['fullName'],
+                    'batting_order': player.get('battingOrder', ''),
+                    'position': player_position
+                })
+    return rows
+
+
+
+def hydrated_lineup_rows(game, team_name_to_abbreviation):
+    # Lineup rows from a hydrated schedule game, and whether both teams had a pitcher and a lineup posted
+    rows = []
+    complete = True
+    lineups = game.get('lineups', {})
+    for team in ['home', 'away']:
+        team_name = game['teams'][team]['team']['name']
+        team_abbr = team_name_to_abbreviation.get(team_name, None)
+        pitcher = game['teams'][team].get('probablePitcher')
+        batters = lineups.get(f'{team}Players', [])
+        complete = complete and pitcher is not None and len(batters) > 0
+
+        players = [(pitcher, '', 'P')] if pitcher is not None else []
+        players += [(batter, str((slot + 1) * 100), batter.get('primaryPosition', {}).get('abbreviation', ''))
+                    for slot, batter in enumerate(batters)]
+        for player, batting_order, position in players:
+            rows.append({
+                'game_id': game['gamePk'],
+                'game_date': game['officialDate'],
+                'team': team_name,
+                'team_abbr': team_abbr,
+                'player_id': player['id'],
+                'player_name': player['fullName'],
+                'batting_order': batting_order,
+                'position': position
+            })
+    return rows, complete
+
+
+def lineup_role(row):
+    # Starting pitchers are the rows without a batting order
+    return 'batter' if row['batting_order'] else 'pitcher'
+
+
+def fetch_lineup_rows(date, team_name_to_abbreviation, client):
+    # One hydrated schedule request covers the slate; boxscores are fetched only for games it leaves incomplete
+    schedule_data = client.schedule(date, hydrate=LINEUP_HYDRATION)
+    if schedule_data is None:
+        return None
+
+    games = schedule_games(schedule_data)
+    game_rows = {}
+    incomplete = []
+    for game in games:
+        game_rows[game['gamePk']], complete = hydrated_lineup_rows(game, team_name_to_abbreviation)
+        if not complete:
+            incomplete.append(game['gamePk'])
+
+    boxscores = client.boxscores(incomplete)
+    for game in games:
+        game_id = game['gamePk']
+        if game_id not in boxscores:
+            continue
+        if boxscores[game_id] is None:
+            print(f"Failed to fetch lineup for game {game_id}")
+            continue
+        box_rows = boxscore_lineup_rows(game_id, game['officialDate'], boxscores[game_id], team_name_to_abbreviation)
+        # Merged per team and role: before first pitch a boxscore often has a batting order but no pitchers yet,
+        # and the schedule's probable pitcher must still lead that team's lineup
+        box_roles = {(row['team'], lineup_role(row)) for row in box_rows}
+        game_rows[game_id] = box_rows + [row for row in game_rows[game_id]
+                                         if (row['team'], lineup_role(row)) not in box_roles]
+
+    return [row for game in games for row in game_rows[game['gamePk']]]
+
+
+statsapi_client = StatsApiClient(cache=response_cache)
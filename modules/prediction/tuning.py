@@ -0,0 +1,112 @@
+import json
+import math
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import GroupKFold, ParameterGrid, ParameterSampler
+
+# Fold scores of past searches, kept next to the feature matrix they were computed on
+TUNING_RESULTS_FILE = 'tuning_results.jsonl'
+
+# The grid matchup_test has always searched
+PARAM_GRID = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_split': [2, 5, 10]
+}
+
+
+def holdout_mask(game_pk, test_fraction=0.2, random_state=42):
+    # Whole games go to the test set, so no game contributes rows to both sides
+    games, inverse = np.unique(game_pk, return_inverse=True)
+    test_games = np.random.default_rng(random_state).random(len(games)) < test_fraction
+    return test_games[inverse]
+
+
+def fold_rows(game_pk, fold, n_splits=5, random_state=42):
+    # (train rows, validation rows) of one GroupKFold fold over the non-held-out rows
+    search_rows = np.flatnonzero(~holdout_mask(game_pk, random_state=random_state))
+    splits = GroupKFold(n_splits=n_splits).split(search_rows, groups=game_pk[search_rows])
+    train_idx, val_idx = list(splits)[fold]
+    return search_rows[train_idx], search_rows[val_idx]
+
+
+def subsample_games(rows, game_pk, fraction, random_state=42):
+    # The same seed keeps each round's games a superset of the previous round's
+    if fraction >= 1:
+        return rows
+    games = np.unique(game_pk[rows])
+    keep = np.random.default_rng(random_state).permutation(games)[:max(1, math.ceil(len(games) * fraction))]
+    return rows[np.isin(game_pk[rows], keep)]
+
+
+def evaluate(X, y, game_pk, params, fold, fraction, n_splits=5, random_state=42):
+    # Runs in a worker process; X, y and game_pk arrive as memory maps, not copies
+    train_rows, val_rows = fold_rows(game_pk, fold, n_splits, random_state)
+    train_rows = subsample_games(train_rows, game_pk, fraction, random_state)
+    model = RandomForestClassifier(random_state=random_state, n_jobs=1, **params)
+    model.fit(X[train_rows], y[train_rows])
+    return accuracy_score(y[val_rows], model.predict(X[val_rows]))
+
+
+def result_key(matrix_key, params, fold, fraction):
+    return json.dumps([matrix_key, sorted(params.items()), fold, round(fraction, 6)])
+
+
+class SearchResults:
+    """Fold scores persisted as JSON lines, so an interrupted search resumes where it stopped."""
+
+    def __init__(self, path):
+        self.path = path
+        self.scores = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    record = json.loads(line)
+                    self.scores[record['key']] = record['score']
+
+    def add(self, key, score):
+        self.scores[key] = score
+        with open(self.path, 'a') as file:
+            file.write(json.dumps({'key': key, 'score': score}) + '\n')
+
+
+def successive_halving_search(X, y, game_pk, results_path, matrix_key, param_grid=PARAM_GRID, n_candidates=None,
+                              factor=3, n_splits=5, n_jobs=-1, random_state=42):
+    # Every candidate starts on 1/factor^k of the training games; each round keeps the best 1/factor of
+    # them and gives the survivors factor times more games, ending with the full data.
+    if n_candidates is None:
+        candidates = list(ParameterGrid(param_grid))
+    else:
+        candidates = list(ParameterSampler(param_grid, n_iter=n_candidates, random_state=random_state))
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor)))
+    results = SearchResults(results_path)
+
+    for round_index in range(n_rounds):
+        fraction = float(factor) ** (round_index - n_rounds + 1)
+        tasks = [(params, fold) for params in candidates for fold in range(n_splits)]
+        pending = [(params, fold) for params, fold in tasks
+                   if result_key(matrix_key, params, fold, fraction) not in results.scores]
+        print(f"Round {round_index + 1}/{n_rounds}: {len(candidates)} candidates on {fraction:.0%} of the games, "
+              f"{len(pending)} of {len(tasks)} fits to run")
+
+        if pending:
+            scores = Parallel(n_jobs=n_jobs, return_as='generator')(
+                delayed(evaluate)(X, y, game_pk, params, fold, fraction, n_splits, random_state)
+                for params, fold in pending)
+            # Each score is saved as soon as it arrives
+            for (params, fold), score in zip(pending, scores):
+                results.add(result_key(matrix_key, params, fold, fraction), score)
+
+        mean_scores = [np.mean([results.scores[result_key(matrix_key, params, fold, fraction)]
+                                for fold in range(n_splits)]) for params in candidates]
+        # Ties keep grid order, so reruns pick the same survivors
+        ranking = np.argsort(-np.asarray(mean_scores), kind='stable')
+        for index in ranking[:3]:
+            print(f"  {mean_scores[index]:.4f} {candidates[index]}")
+        candidates = [candidates[index] for index in ranking[:max(1, math.ceil(len(candidates) / factor))]]
+
+    return candidates[0], max(mean_scores)
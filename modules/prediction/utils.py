@@ -1,26 +1,31 @@
 import random
-import pandas as pd
+from datetime import date
 
+from ..game_management.schedule_store import schedule_store
+from .cache import prediction_cache, game_lineup_hash
+from .registry import model_registry
 
-def get_game_predictions(selected_games):
-    # Fetch the current game schedules
-    schedules = pd.read_json('game_schedules.json', convert_dates=['Date'])
 
-    # Filter the schedules to include only the selected games
-    selected_schedules = schedules[schedules['id'].isin(selected_games)]
+def get_game_predictions(selected_games, lineup_fingerprints=None):
+    # Look up the selected games in the in-memory schedule index
+    selected_schedules = schedule_store.get_games(selected_games)
+
+    # Cached per game until the TTL expires, the confirmed lineup changes or a new model is published
+    model_version = model_registry.version
+    # Per-team lineup fingerprints as the lineup watcher last published them; requests never fetch lineups
+    if lineup_fingerprints is None:
+        lineup_fingerprints = prediction_cache.lineup_fingerprints(date.today())
 
     predictions = []
-    for _, game in selected_schedules.iterrows():
-        prediction = {
+    for game in selected_schedules:
+        lineup_hash = game_lineup_hash(lineup_fingerprints, [game['home_team'], game['away_team']])
+        prediction = prediction_cache.get_or_compute(game['id'], lineup_hash, model_version, lambda: {
             'id': game['id'],
-            'away_team': game['Opp'],
-            'home_team': game['Tm'],
-            'prediction': random.choice([f"{game['Opp']} wins", f"{game['Tm']} wins"]),
+            'away_team': game['away_team'],
+            'home_team': game['home_team'],
+            'prediction': random.choice([f"{game['away_team']} wins", f"{game['home_team']} wins"]),
             'odds': round(random.uniform(1.5, 3.0), 2)
-        }
+        })
         predictions.append(prediction)
 
-    # Debugging: Print the filtered predictions
-    print(f"Filtered predictions: {predictions}")
-
     return predictions